@@ -2,16 +2,36 @@
 Database manager for AniList service
 Supports development (Docker local) and production (Supabase) environments
 """
+import json
 import logging
 import os
 from typing import Optional, Dict, Any
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
-from contextlib import contextmanager
-from .schema import Base, apply_updated_at_triggers
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from contextlib import asynccontextmanager, contextmanager
+from .schema import Base, apply_updated_at_triggers, apply_column_compression, create_materialized_views, create_partitioned_tables
 from ..models import ServiceConfig
 
+try:
+    import orjson
+except ImportError:  # orjson opzionale: fallback sul modulo json standard
+    orjson = None
+
+try:
+    import psycopg
+except ImportError:  # psycopg 3 opzionale: senza, gli URL restano sul driver psycopg2
+    psycopg = None
+
+# Serializzazione delle colonne JSON/JSONB (tags, external_links, ...) su entrambi gli engine
+if orjson is not None:
+    _json_serializer = lambda value: orjson.dumps(value).decode()
+    _json_deserializer = orjson.loads
+else:
+    _json_serializer = json.dumps
+    _json_deserializer = json.loads
+
 
 class DatabaseManager:
     """Manage database connections and sessions"""
@@ -21,19 +41,23 @@ class DatabaseManager:
         self.logger = logging.getLogger(__name__)
         self.engine = None
         self.SessionLocal = None
+        self.async_engine = None
+        self.AsyncSessionLocal = None
         self._initialize_database()
     
     def _initialize_database(self):
         """Initialize database connection and session factory"""
         try:
             # Build database URL based on environment
-            db_url = self._build_database_url()
+            db_url = self._use_psycopg3_driver(self._build_database_url())
             
             # Create engine with appropriate settings
             engine_kwargs = {
                 'echo': self.config.database.echo,
                 'pool_pre_ping': True,
                 'pool_recycle': 3600,  # Recycle connections after 1 hour
+                'json_serializer': _json_serializer,
+                'json_deserializer': _json_deserializer,
             }
             
             # PostgreSQL connection pool settings
@@ -45,12 +69,45 @@ class DatabaseManager:
                     'connect_args': {
                         'sslmode': 'require' if 'supabase.co' in db_url else 'prefer',
                         'connect_timeout': 30,
-                        'application_name': 'anilist-service'
+                        'application_name': 'anilist-service',
+                        'options': f'-c statement_timeout={self.config.database.statement_timeout_ms}',
+                        # Rileva connessioni morte (NAT/load balancer) senza aspettare il timeout TCP
+                        'keepalives': 1,
+                        'keepalives_idle': self.config.database.keepalives_idle,
+                        'keepalives_interval': 10,
+                        'keepalives_count': 3
                     }
                 })
             
             self.engine = create_engine(db_url, **engine_kwargs)
             
+            # Engine asyncpg per i percorsi async (sync AniList): il driver non blocca l'event loop
+            if db_url.startswith('postgresql'):
+                self.async_engine = create_async_engine(
+                    self._use_asyncpg_driver(db_url),
+                    echo=self.config.database.echo,
+                    pool_pre_ping=True,
+                    pool_recycle=3600,
+                    pool_size=self.config.database.pool_size,
+                    max_overflow=self.config.database.max_overflow,
+                    pool_timeout=30,
+                    json_serializer=_json_serializer,
+                    json_deserializer=_json_deserializer,
+                    connect_args={
+                        'ssl': 'require' if 'supabase.co' in db_url else 'prefer',
+                        'timeout': 30,
+                        'server_settings': {
+                            'application_name': 'anilist-service',
+                            'statement_timeout': str(self.config.database.statement_timeout_ms)
+                        }
+                    }
+                )
+                self.AsyncSessionLocal = async_sessionmaker(
+                    self.async_engine,
+                    expire_on_commit=False,
+                    autoflush=False
+                )
+            
             # Setup session factory
             self.SessionLocal = sessionmaker(
                 autocommit=False,
@@ -91,6 +148,26 @@ class DatabaseManager:
         
         return f"postgresql://{dev_config['user']}:{dev_config['password']}@{dev_config['host']}:{dev_config['port']}/{dev_config['name']}"
     
+    @staticmethod
+    def _use_psycopg3_driver(db_url: str) -> str:
+        """
+        Route plain PostgreSQL URLs to the psycopg 3 driver when it is installed
+        psycopg 3 supports pipeline mode, used by the batch sync to cut network round trips;
+        without it the URL is left to SQLAlchemy's default driver (psycopg2)
+        """
+        if psycopg is None:
+            return db_url
+        for prefix in ('postgresql://', 'postgres://'):
+            if db_url.startswith(prefix):
+                return 'postgresql+psycopg://' + db_url[len(prefix):]
+        return db_url
+    
+    @staticmethod
+    def _use_asyncpg_driver(db_url: str) -> str:
+        """Route a PostgreSQL URL (any sync driver) to asyncpg for the async engine"""
+        scheme, rest = db_url.split('://', 1)
+        return 'postgresql+asyncpg://' + rest if scheme.startswith('postgres') else db_url
+    
     def _test_connection(self):
         """Test database connection"""
         try:
@@ -120,9 +197,12 @@ class DatabaseManager:
             # Create all tables
             Base.metadata.create_all(bind=self.engine)
             
-            # Apply PostgreSQL triggers for updated_at
+            # Apply PostgreSQL triggers for updated_at and trending snapshot partitions
             if self.engine.url.drivername.startswith('postgresql'):
                 apply_updated_at_triggers(self.engine)
+                apply_column_compression(self.engine)
+                create_partitioned_tables(self.engine)
+                create_materialized_views(self.engine)
             
             self.logger.info("Database tables created successfully")
         except Exception as e:
@@ -152,6 +232,21 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @asynccontextmanager
+    async def get_async_session(self):
+        """Get async database session with automatic cleanup (PostgreSQL only)"""
+        if self.AsyncSessionLocal is None:
+            raise RuntimeError("Async sessions require a PostgreSQL database")
+        
+        async with self.AsyncSessionLocal() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                self.logger.error(f"Database session error: {e}")
+                raise
+
     def get_session_direct(self) -> Session:
         """Get database session for manual management"""
         return self.SessionLocal()
@@ -265,3 +360,12 @@ class DatabaseManager:
                 self.logger.info("Database connections closed")
         except Exception as e:
             self.logger.error(f"Error closing database connections: {e}")
+
+    async def close_async(self):
+        """Close async database connections"""
+        try:
+            if self.async_engine:
+                await self.async_engine.dispose()
+                self.logger.info("Async database connections closed")
+        except Exception as e:
+            self.logger.error(f"Error closing async database connections: {e}")
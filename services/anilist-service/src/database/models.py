@@ -3,7 +3,7 @@ SQLAlchemy database models for AniList service
 """
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, Float, Boolean, 
-    JSON, ForeignKey, Index, Enum as SQLEnum
+    JSON, ForeignKey, Index, Computed, Enum as SQLEnum
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -43,6 +43,12 @@ class Character(Base):
     popularity_tier = Column(String(10), index=True)
     cosplay_potential = Column(Float, default=0.0)
     
+    # Search (generated column, backed by pg_trgm GIN index)
+    name_search = Column(
+        Text,
+        Computed("coalesce(name, '') || ' ' || coalesce(name_native, '')", persisted=True)
+    )
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -57,7 +63,10 @@ class Character(Base):
     __table_args__ = (
         Index('idx_character_favourites_desc', favourites.desc()),
         Index('idx_character_gender_favourites', gender, favourites.desc()),
-        Index('idx_character_updated_at', updated_at.desc()),
+        Index('idx_character_updated_at', updated_at.asc().nullsfirst()),
+        Index('idx_character_updated_at_null', id, postgresql_where=updated_at.is_(None)),
+        Index('idx_character_name_search_trgm', name_search,
+              postgresql_using='gin', postgresql_ops={'name_search': 'gin_trgm_ops'}),
     )
 
 
@@ -241,6 +250,7 @@ class TrendingScore(Base):
         Index('idx_trending_score_final_desc', final_score.desc()),
         Index('idx_trending_score_timestamp_desc', timestamp.desc()),
         Index('idx_trending_score_entity_timestamp', entity_type, entity_id, timestamp.desc()),
+        Index('idx_trending_score_character_timestamp', character_id, timestamp.desc()),
     )
 
 
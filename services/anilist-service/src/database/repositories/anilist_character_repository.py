@@ -2,29 +2,71 @@
 Repository per AniListCharacter con nuovo schema estensibile
 """
 import logging
-from typing import List, Optional, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func, select
+from operator import itemgetter
+from typing import List, Optional, Dict, Any, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, desc, func, select, delete, text
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
 from datetime import datetime, timedelta, date
 
 from ..schema import AniListCharacter, AniListMedia, AniListCharacterMedia, AniListTrendingSnapshot
 from ...models import Character as PydanticCharacter, CharacterMedia as PydanticCharacterMedia
 
 
+# Colonne scritte dal bulk upsert (id è la chiave di conflitto)
+_CHARACTER_COLUMNS = (
+    'id', 'name_full', 'name_first', 'name_middle', 'name_last', 'name_native',
+    'name_alternative', 'name_alternative_spoiler', 'image_large', 'image_medium',
+    'description', 'gender', 'age', 'blood_type', 'birth_year', 'birth_month', 'birth_day',
+    'favourites', 'is_favourite', 'is_favourite_blocked', 'site_url', 'mod_notes',
+    'last_fetched_at',
+)
+
+# Sotto questa soglia un INSERT multi-riga costa meno della tabella di staging + COPY
+_COPY_MIN_ROWS = 100
+
+# Valori di una riga nell'ordine di _CHARACTER_COLUMNS (per il COPY)
+_character_values = itemgetter(*_CHARACTER_COLUMNS)
+
+# Statement Core costruiti una volta sola (niente unit of work ORM): ogni batch passa solo i parametri
+_UPSERT_STMT = postgres_insert(AniListCharacter.__table__)
+_UPSERT_STMT = _UPSERT_STMT.on_conflict_do_update(
+    index_elements=[AniListCharacter.id],
+    set_={
+        column: _UPSERT_STMT.excluded[column]
+        for column in _CHARACTER_COLUMNS + ('updated_at',) if column != 'id'
+    }
+)
+
+_STAGE_COLUMNS = ', '.join(_CHARACTER_COLUMNS)
+_STAGE_UPDATES = ', '.join(
+    f"{column} = EXCLUDED.{column}" for column in _CHARACTER_COLUMNS if column != 'id'
+)
+_STAGE_CREATE_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS _characters_stage
+    (LIKE {AniListCharacter.__tablename__} INCLUDING DEFAULTS) ON COMMIT DROP
+"""
+_STAGE_MERGE_SQL = f"""
+    INSERT INTO {AniListCharacter.__tablename__} ({_STAGE_COLUMNS}, created_at, updated_at)
+    SELECT {_STAGE_COLUMNS}, created_at, updated_at FROM _characters_stage
+    ON CONFLICT (id) DO UPDATE SET {_STAGE_UPDATES}, updated_at = EXCLUDED.updated_at
+"""
+
+
 class AniListCharacterRepository:
     """Repository per operazioni sui personaggi AniList"""
     
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
         self.logger = logging.getLogger(__name__)
     
-    def upsert_character(self, character_data: PydanticCharacter) -> Tuple[AniListCharacter, bool]:
+    async def upsert_character(self, character_data: PydanticCharacter) -> Tuple[AniListCharacter, bool]:
         """
         Upsert character data - inserisce nuovo o aggiorna esistente
         Returns (character, is_new) tuple
         """
         try:
-            existing = self.get_character_by_id(character_data.id)
+            existing = await self.get_character_by_id(character_data.id)
             
             if existing:
                 # Aggiorna personaggio esistente se necessario
@@ -35,14 +77,14 @@ class AniListCharacterRepository:
                     return existing, False
             else:
                 # Crea nuovo personaggio
-                new_character = self._create_character_from_data(character_data)
+                new_character = await self._create_character_from_data(character_data)
                 return new_character, True
                 
         except Exception as e:
             self.logger.error(f"Error upserting character {character_data.id}: {e}")
             raise
     
-    def upsert_characters_batch(self, characters_data: List[PydanticCharacter]) -> Dict[str, int]:
+    async def upsert_characters_batch(self, characters_data: List[PydanticCharacter]) -> Dict[str, int]:
         """
         Batch upsert per migliore performance
         Returns stats: {'created': int, 'updated': int, 'skipped': int}
@@ -52,30 +94,125 @@ class AniListCharacterRepository:
         try:
             # Ottieni mappa personaggi esistenti
             character_ids = [char.id for char in characters_data]
-            existing_chars = self._get_existing_characters_map(character_ids)
+            existing_chars = await self._get_existing_characters_map(character_ids)
             
             # Processa in batch
             batch_size = 100
             for i in range(0, len(characters_data), batch_size):
                 batch = characters_data[i:i + batch_size]
-                batch_stats = self._process_character_batch(batch, existing_chars)
+                batch_stats = await self._process_character_batch(batch, existing_chars)
                 
                 # Aggiorna statistiche
                 for key in stats:
                     stats[key] += batch_stats[key]
                 
                 # Commit batch
-                self.session.commit()
+                await self.session.commit()
                 
             self.logger.info(f"Batch upsert completed: {stats}")
             return stats
             
         except Exception as e:
             self.logger.error(f"Error in batch upsert: {e}")
-            self.session.rollback()
+            await self.session.rollback()
             raise
     
-    def _process_character_batch(self, batch: List[PydanticCharacter], existing_chars: Dict[int, AniListCharacter]) -> Dict[str, int]:
+    async def bulk_upsert_characters(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Upsert di una pagina di personaggi con un solo statement lato server
+        `rows` sono dict con tutte e sole le chiavi di _CHARACTER_COLUMNS
+        (vedi AniListFetcher.parse_character_batch), senza istanziare oggetti ORM
+        Batch >= _COPY_MIN_ROWS: COPY in una tabella TEMP + INSERT ... SELECT ... ON CONFLICT
+        (copy_records_to_table di asyncpg); batch piccoli: INSERT multi-riga ON CONFLICT
+        Returns numero di righe inserite o aggiornate
+        """
+        if not rows:
+            return 0
+        
+        # Un id ripetuto nello stesso statement fa fallire ON CONFLICT DO UPDATE
+        # ("cannot affect row a second time"): vince l'ultima occorrenza
+        rows = list({row['id']: row for row in rows}.values())
+        now = datetime.utcnow()
+        
+        try:
+            if len(rows) >= _COPY_MIN_ROWS:
+                upserted = await self._copy_upsert_characters(rows, now)
+            else:
+                # executemany Core: insertmanyvalues raggruppa i parametri in INSERT multi-riga
+                await self.session.execute(_UPSERT_STMT, [
+                    {**row, 'created_at': now, 'updated_at': now} for row in rows
+                ])
+                upserted = len(rows)
+            
+            await self.session.commit()
+            return upserted
+            
+        except Exception as e:
+            self.logger.error(f"Error in bulk upsert of {len(rows)} characters: {e}")
+            await self.session.rollback()
+            raise
+    
+    async def bulk_upsert_character_columns(self, columns: Dict[str, List[Any]]) -> int:
+        """
+        Come bulk_upsert_characters ma con i dati per colonna (una lista per colonna di
+        _CHARACTER_COLUMNS, vedi AniListFetcher.parse_character_columns): le tuple per il
+        COPY escono da zip() sulle colonne senza un dict per riga
+        Pagine lette in parallelo dalla classifica live possono ripetere un personaggio:
+        le righe sono deduplicate per id (vince l'ultima), come in bulk_upsert_characters
+        Returns numero di righe inserite o aggiornate
+        """
+        if not columns['id']:
+            return 0
+        
+        now = datetime.utcnow()
+        values = dict(zip(
+            columns['id'], zip(*(columns[column] for column in _CHARACTER_COLUMNS))
+        )).values()
+        count = len(values)
+        
+        try:
+            if count >= _COPY_MIN_ROWS:
+                upserted = await self._copy_upsert_records(
+                    [(*row, now, now) for row in values]
+                )
+            else:
+                await self.session.execute(_UPSERT_STMT, [
+                    {**dict(zip(_CHARACTER_COLUMNS, row)), 'created_at': now, 'updated_at': now}
+                    for row in values
+                ])
+                upserted = count
+            
+            await self.session.commit()
+            return upserted
+            
+        except Exception as e:
+            self.logger.error(f"Error in bulk upsert of {count} characters: {e}")
+            await self.session.rollback()
+            raise
+    
+    async def _copy_upsert_characters(self, rows: List[Dict[str, Any]], now: datetime) -> int:
+        """COPY delle righe in staging e merge con un solo INSERT ... ON CONFLICT"""
+        return await self._copy_upsert_records(
+            [(*_character_values(row), now, now) for row in rows]
+        )
+    
+    async def _copy_upsert_records(self, records: List[Tuple[Any, ...]]) -> int:
+        """COPY di tuple (_CHARACTER_COLUMNS, created_at, updated_at) in staging e merge"""
+        # Il CREATE passa dalla sessione così apre la transazione: ON COMMIT DROP vale fino al commit
+        await self.session.execute(text(_STAGE_CREATE_SQL))
+        
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            '_characters_stage',
+            records=records,
+            columns=[*_CHARACTER_COLUMNS, 'created_at', 'updated_at']
+        )
+        
+        result = await self.session.execute(text(_STAGE_MERGE_SQL))
+        return result.rowcount
+    
+    async def _process_character_batch(self, batch: List[PydanticCharacter], existing_chars: Dict[int, AniListCharacter]) -> Dict[str, int]:
         """Processa un batch di personaggi"""
         stats = {'created': 0, 'updated': 0, 'skipped': 0}
         
@@ -91,7 +228,7 @@ class AniListCharacterRepository:
                         stats['skipped'] += 1
                 else:
                     # Crea nuovo
-                    self._create_character_from_data(char_data)
+                    await self._create_character_from_data(char_data)
                     stats['created'] += 1
                     
             except Exception as e:
@@ -100,11 +237,9 @@ class AniListCharacterRepository:
                 
         return stats
     
-    def _get_existing_characters_map(self, character_ids: List[int]) -> Dict[int, AniListCharacter]:
+    async def _get_existing_characters_map(self, character_ids: List[int]) -> Dict[int, AniListCharacter]:
         """Ottieni personaggi esistenti come mappa"""
-        existing = self.session.query(AniListCharacter).filter(
-            AniListCharacter.id.in_(character_ids)
-        ).all()
+        existing = await self.get_characters_by_ids(character_ids)
         
         return {char.id: char for char in existing}
     
@@ -171,7 +306,7 @@ class AniListCharacterRepository:
         
         existing.last_fetched_at = datetime.now()
     
-    def _create_character_from_data(self, char_data: PydanticCharacter) -> AniListCharacter:
+    async def _create_character_from_data(self, char_data: PydanticCharacter) -> AniListCharacter:
         """Crea nuovo personaggio dai dati Pydantic"""
         character = AniListCharacter(
             id=char_data.id,
@@ -200,33 +335,48 @@ class AniListCharacterRepository:
         )
         
         self.session.add(character)
-        self.session.flush()  # Ottieni ID
+        await self.session.flush()  # Ottieni ID
         
         return character
     
     # Query methods
     
-    def get_character_by_id(self, character_id: int) -> Optional[AniListCharacter]:
+    async def get_character_by_id(self, character_id: int) -> Optional[AniListCharacter]:
         """Ottieni personaggio per ID AniList"""
-        return self.session.query(AniListCharacter).filter(
-            AniListCharacter.id == character_id
-        ).first()
+        return await self.session.get(AniListCharacter, character_id)
     
-    def get_characters_by_ids(self, character_ids: List[int]) -> List[AniListCharacter]:
+    async def get_characters_by_ids(self, character_ids: List[int]) -> List[AniListCharacter]:
         """Ottieni multipli personaggi per ID"""
-        return self.session.query(AniListCharacter).filter(
-            AniListCharacter.id.in_(character_ids)
-        ).all()
+        result = await self.session.scalars(
+            select(AniListCharacter).where(AniListCharacter.id.in_(character_ids))
+        )
+        return list(result)
     
-    def get_trending_characters(self, limit: int = 50, gender: str = None, days: int = 7) -> List[AniListCharacter]:
+    async def get_existing_ids(self, character_ids: List[int], max_age_hours: Optional[int] = None) -> Set[int]:
+        """
+        Ottieni gli ID già presenti in database (senza caricare le righe)
+        Con `max_age_hours` solo quelli recuperati da AniList entro quella finestra
+        """
+        if not character_ids:
+            return set()
+        
+        query = select(AniListCharacter.id).where(AniListCharacter.id.in_(character_ids))
+        if max_age_hours is not None:
+            # last_fetched_at è scritto in UTC (parse_character_batch, bulk_upsert_characters)
+            cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
+            query = query.where(AniListCharacter.last_fetched_at >= cutoff_time)
+        
+        return set(await self.session.scalars(query))
+    
+    async def get_trending_characters(self, limit: int = 50, gender: str = None, days: int = 7) -> List[AniListCharacter]:
         """
         Ottieni personaggi trending
         NOTA: Per ora ordina per favourites dato che non abbiamo ancora calcolato i trending scores
         """
-        query = self.session.query(AniListCharacter)
+        query = select(AniListCharacter)
         
         if gender:
-            query = query.filter(AniListCharacter.gender == gender)
+            query = query.where(AniListCharacter.gender == gender)
         
         # Per ora ordiniamo per favourites come proxy del trending
         # TODO: Implementare il calcolo del trending score basato su:
@@ -234,66 +384,81 @@ class AniListCharacterRepository:
         # - Media associati trending  
         # - Recency factor
         # - Gender boost
-        return query.order_by(desc(AniListCharacter.favourites)).limit(limit).all()
+        result = await self.session.scalars(query.order_by(desc(AniListCharacter.favourites)).limit(limit))
+        return list(result)
     
-    def get_characters_needing_update(self, max_age_hours: int = 168) -> List[AniListCharacter]:
+    async def get_characters_needing_update(self, max_age_hours: int = 168) -> List[AniListCharacter]:
         """Ottieni personaggi che necessitano aggiornamento"""
         cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
         
-        return self.session.query(AniListCharacter).filter(
-            or_(
-                AniListCharacter.last_fetched_at.is_(None),
-                AniListCharacter.last_fetched_at < cutoff_time
+        result = await self.session.scalars(
+            select(AniListCharacter).where(
+                or_(
+                    AniListCharacter.last_fetched_at.is_(None),
+                    AniListCharacter.last_fetched_at < cutoff_time
+                )
             )
-        ).all()
+        )
+        return list(result)
     
-    def search_characters(self, query: str, limit: int = 20) -> List[AniListCharacter]:
+    async def search_characters(self, query: str, limit: int = 20) -> List[AniListCharacter]:
         """Cerca personaggi per nome"""
         search_pattern = f"%{query}%"
         
-        return self.session.query(AniListCharacter).filter(
-            or_(
-                AniListCharacter.name_full.ilike(search_pattern),
-                AniListCharacter.name_first.ilike(search_pattern),
-                AniListCharacter.name_last.ilike(search_pattern),
-                AniListCharacter.name_native.ilike(search_pattern)
-            )
-        ).order_by(desc(AniListCharacter.favourites)).limit(limit).all()
+        result = await self.session.scalars(
+            select(AniListCharacter).where(
+                or_(
+                    AniListCharacter.name_full.ilike(search_pattern),
+                    AniListCharacter.name_first.ilike(search_pattern),
+                    AniListCharacter.name_last.ilike(search_pattern),
+                    AniListCharacter.name_native.ilike(search_pattern)
+                )
+            ).order_by(desc(AniListCharacter.favourites)).limit(limit)
+        )
+        return list(result)
     
-    def get_character_stats(self) -> Dict[str, Any]:
+    async def get_character_stats(self) -> Dict[str, Any]:
         """Ottieni statistiche personaggi"""
-        total = self.session.query(AniListCharacter).count()
-        
-        gender_stats = self.session.query(
-            AniListCharacter.gender,
-            func.count(AniListCharacter.id)
-        ).group_by(AniListCharacter.gender).all()
+        totals = (await self.session.execute(
+            select(
+                func.count(AniListCharacter.id),
+                func.avg(AniListCharacter.favourites),
+                func.max(AniListCharacter.updated_at)
+            )
+        )).one()
         
-        avg_favourites = self.session.query(func.avg(AniListCharacter.favourites)).scalar() or 0
+        gender_stats = (await self.session.execute(
+            select(
+                AniListCharacter.gender,
+                func.count(AniListCharacter.id)
+            ).group_by(AniListCharacter.gender)
+        )).all()
         
         return {
-            'total_characters': total,
+            'total_characters': totals[0],
             'gender_distribution': dict(gender_stats),
-            'avg_favourites': float(avg_favourites),
-            'last_update': self.session.query(func.max(AniListCharacter.updated_at)).scalar()
+            'avg_favourites': float(totals[1] or 0),
+            'last_update': totals[2]
         }
     
-    def cleanup_old_characters(self, days_old: int = 365) -> int:
+    async def cleanup_old_characters(self, days_old: int = 365) -> int:
         """Rimuovi personaggi non aggiornati da X giorni (solo se poco popolari)"""
         cutoff_date = datetime.now() - timedelta(days=days_old)
         
-        deleted = self.session.query(AniListCharacter).filter(
-            AniListCharacter.updated_at < cutoff_date,
-            AniListCharacter.favourites < 10  # Solo personaggi non popolari
-        ).delete()
+        result = await self.session.execute(
+            delete(AniListCharacter).where(
+                AniListCharacter.updated_at < cutoff_date,
+                AniListCharacter.favourites < 10  # Solo personaggi non popolari
+            )
+        )
         
-        return deleted
+        return result.rowcount
     
-    def create_trending_snapshot(self, character_id: int, trending_data: Dict[str, Any]) -> AniListTrendingSnapshot:
+    async def create_trending_snapshot(self, character_id: int, trending_data: Dict[str, Any]) -> AniListTrendingSnapshot:
         """Crea snapshot trending per personaggio"""
         
         # Ottieni dati personaggio per denormalizzazione
-        character = self.get_character_by_id(character_id)
+        character = await self.get_character_by_id(character_id)
         
         snapshot = AniListTrendingSnapshot(
             character_id=character_id,
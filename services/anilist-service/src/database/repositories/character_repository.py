@@ -1,17 +1,83 @@
 """
 Character repository with upsert logic for sync operations
 """
+import json
 import logging
-from typing import List, Optional, Dict, Any, Tuple, Set
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, func, select
+from typing import List, Optional, Dict, Any, Tuple, Set, Iterator
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy import and_, or_, desc, func, inspect, select, text
 from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 
-from ..models import Character, CharacterMedia, Media, TrendingSnapshot
+try:
+    import orjson
+    _json_dumps = lambda value: orjson.dumps(value).decode()
+except ImportError:  # orjson opzionale: fallback sul modulo json standard
+    _json_dumps = json.dumps
+
+from ..models import Character, CharacterMedia, Media, MediaTypeEnum, TrendingSnapshot
 from ...models import Character as PydanticCharacter, CharacterMedia as PydanticCharacterMedia
 
 
+_MEDIA_TYPE_MAP = {
+    'ANIME': MediaTypeEnum.ANIME,
+    'MANGA': MediaTypeEnum.MANGA,
+}
+
+# Pydantic fields copied into character rows; nested models are flattened below
+_ROW_FIELDS = {
+    'id', 'name', 'image', 'description', 'gender', 'age', 'blood_type',
+    'date_of_birth', 'site_url', 'favourites', 'is_favourite',
+    'is_favourite_blocked', 'mod_notes',
+}
+
+_NESTED_COLUMNS = (
+    ('name', {
+        'first': 'name_first',
+        'middle': 'name_middle',
+        'last': 'name_last',
+        'full': 'name_full',
+        'native': 'name_native',
+        'alternative': 'name_alternative',
+        'alternative_spoiler': 'name_alternative_spoiler',
+    }),
+    ('image', {'large': 'image_large', 'medium': 'image_medium'}),
+    ('date_of_birth', {'year': 'birth_year', 'month': 'birth_month', 'day': 'birth_day'}),
+)
+
+# Column order used when staging character_media rows through COPY
+_CHARACTER_MEDIA_COLUMNS = (
+    'character_id', 'media_id', 'role', 'voice_actors',
+    'media_popularity', 'media_favourites', 'media_average_score', 'media_trending',
+)
+
+# Columns loaded by list queries; heavy fields (description, alternative_names) stay deferred
+_LIST_COLUMNS = (
+    Character.id,
+    Character.character_id,
+    Character.name,
+    Character.name_native,
+    Character.favourites,
+    Character.gender,
+    Character.image_medium,
+)
+
+
+def _to_row(char_data: PydanticCharacter) -> Dict[str, Any]:
+    """Build a flat character row dict from the Pydantic model with a single model_dump()"""
+    row = char_data.model_dump(mode='json', include=_ROW_FIELDS)
+    
+    for nested, columns in _NESTED_COLUMNS:
+        values = row.pop(nested, None) or {}
+        for key, column in columns.items():
+            row[column] = values.get(key)
+    
+    row['name_alternative'] = row['name_alternative'] or []
+    row['name_alternative_spoiler'] = row['name_alternative_spoiler'] or []
+    return row
+
+
 class CharacterRepository:
     """Repository for character data operations with upsert support"""
     
@@ -48,6 +114,9 @@ class CharacterRepository:
         stats = {'created': 0, 'updated': 0, 'skipped': 0}
         
         try:
+            # One timestamp for the whole batch
+            now = datetime.utcnow()
+            
             # Get existing character IDs in batch
             character_ids = [char.id for char in characters_data]
             existing_chars = self._get_existing_characters_map(character_ids)
@@ -56,7 +125,10 @@ class CharacterRepository:
             batch_size = 100
             for i in range(0, len(characters_data), batch_size):
                 batch = characters_data[i:i + batch_size]
-                batch_stats = self._process_character_batch(batch, existing_chars)
+                with self._pipeline():
+                    batch_stats = self._process_character_batch(batch, existing_chars, now)
+                    # Flush the dirty characters' UPDATEs inside the pipeline, not at commit
+                    self.session.flush()
                 
                 # Update stats
                 for key in stats:
@@ -73,31 +145,66 @@ class CharacterRepository:
             self.session.rollback()
             raise
     
-    def _process_character_batch(self, batch: List[PydanticCharacter], existing_chars: Dict[int, Character]) -> Dict[str, int]:
+    def _pipeline(self):
+        """
+        Pipeline mode on the session connection (psycopg 3)
+        Queued statements are sent without waiting for each response; no-op on other drivers
+        """
+        driver_connection = self.session.connection().connection.driver_connection
+        if hasattr(driver_connection, 'pipeline'):
+            return driver_connection.pipeline()
+        return nullcontext()
+    
+    def _process_character_batch(
+        self, 
+        batch: List[PydanticCharacter], 
+        existing_chars: Dict[int, Character],
+        now: datetime
+    ) -> Dict[str, int]:
         """Process a batch of characters"""
         stats = {'created': 0, 'updated': 0, 'skipped': 0}
+        new_rows = []
         
         for char_data in batch:
             try:
                 if char_data.id in existing_chars:
                     # Update existing
                     existing = existing_chars[char_data.id]
-                    if self._should_update_character(existing, char_data):
-                        self._update_character_fields(existing, char_data)
+                    if self._should_update_character(existing, char_data, now):
+                        self._update_character_fields(existing, char_data, now)
                         stats['updated'] += 1
                     else:
                         stats['skipped'] += 1
                 else:
-                    # Create new
-                    self._create_character_from_data(char_data)
-                    stats['created'] += 1
+                    # Create new (inserted in bulk below)
+                    row = _to_row(char_data)
+                    row['created_at'] = row['updated_at'] = now
+                    new_rows.append(row)
                     
             except Exception as e:
                 self.logger.warning(f"Error processing character {char_data.id}: {e}")
                 stats['skipped'] += 1
+        
+        if new_rows:
+            stats['created'] += len(self._insert_character_rows(new_rows))
                 
         return stats
     
+    def _insert_character_rows(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Bulk insert character rows (Core INSERT ... ON CONFLICT, no ORM objects)
+        Returns only the inserted IDs; nothing is attached to the session
+        """
+        stmt = postgres_insert(Character.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Character.__table__.c.id],
+            set_={
+                column: stmt.excluded[column]
+                for column in rows[0] if column not in ('id', 'created_at')
+            }
+        ).returning(Character.__table__.c.id)
+        return self.session.execute(stmt, rows).scalars().all()
+    
     def _get_existing_characters_map(self, character_ids: List[int]) -> Dict[int, Character]:
         """Get existing characters as a map for efficient lookup"""
         existing = self.session.query(Character).filter(
@@ -106,13 +213,18 @@ class CharacterRepository:
         
         return {char.id: char for char in existing}
     
-    def _should_update_character(self, existing: Character, new_data: PydanticCharacter) -> bool:
+    def _should_update_character(
+        self, 
+        existing: Character, 
+        new_data: PydanticCharacter,
+        now: Optional[datetime] = None
+    ) -> bool:
         """
         Determine if character should be updated based on data freshness and changes
         """
         # Always update if data is stale (older than configured threshold)
         if existing.updated_at:
-            age_hours = (datetime.now() - existing.updated_at).total_seconds() / 3600
+            age_hours = ((now or datetime.utcnow()) - existing.updated_at).total_seconds() / 3600
             if age_hours > 168:  # 7 days - from config
                 return True
         
@@ -137,81 +249,49 @@ class CharacterRepository:
             
         return False
     
-    def _update_character_fields(self, existing: Character, new_data: PydanticCharacter):
+    def _update_character_fields(
+        self, 
+        existing: Character, 
+        new_data: PydanticCharacter,
+        now: Optional[datetime] = None
+    ):
         """Update character fields with new data"""
+        row = _to_row(new_data)
+        
         # Always update these fields
         always_update = [
             'favourites', 'is_favourite', 'mod_notes'
         ]
         
         for field in always_update:
-            if hasattr(new_data, field):
-                setattr(existing, field, getattr(new_data, field))
+            if field in row:
+                setattr(existing, field, row[field])
         
         # Update other fields if they changed
-        field_mappings = {
-            'description': 'description',
-            'gender': 'gender',
-            'age': 'age',
-            'blood_type': 'blood_type',
-        }
+        for field in ('description', 'gender', 'age', 'blood_type'):
+            new_val = row.get(field)
+            if new_val is not None and getattr(existing, field) != new_val:
+                setattr(existing, field, new_val)
+        
+        # Update name, image URLs and date of birth when provided
+        for nested, columns in _NESTED_COLUMNS:
+            if getattr(new_data, nested):
+                for column in columns.values():
+                    setattr(existing, column, row[column])
         
-        for new_field, db_field in field_mappings.items():
-            new_val = getattr(new_data, new_field, None)
-            if new_val is not None and getattr(existing, db_field) != new_val:
-                setattr(existing, db_field, new_val)
-        
-        # Update image URLs
-        if new_data.image:
-            existing.image_large = new_data.image.large
-            existing.image_medium = new_data.image.medium
-        
-        # Update name fields
-        if new_data.name:
-            existing.name_first = new_data.name.first
-            existing.name_middle = new_data.name.middle
-            existing.name_last = new_data.name.last
-            existing.name_full = new_data.name.full
-            existing.name_native = new_data.name.native
-            existing.name_alternative = new_data.name.alternative or []
-            existing.name_alternative_spoiler = new_data.name.alternative_spoiler or []
-        
-        # Update date of birth
-        if new_data.date_of_birth:
-            existing.birth_year = new_data.date_of_birth.year
-            existing.birth_month = new_data.date_of_birth.month
-            existing.birth_day = new_data.date_of_birth.day
-        
-        existing.updated_at = datetime.now()
+        existing.updated_at = now or datetime.utcnow()
     
-    def _create_character_from_data(self, char_data: PydanticCharacter) -> Character:
-        """Create new character from Pydantic model"""
-        character = Character(
-            id=char_data.id,
-            name_first=char_data.name.first if char_data.name else None,
-            name_middle=char_data.name.middle if char_data.name else None,
-            name_last=char_data.name.last if char_data.name else None,
-            name_full=char_data.name.full if char_data.name else None,
-            name_native=char_data.name.native if char_data.name else None,
-            name_alternative=char_data.name.alternative if char_data.name else [],
-            name_alternative_spoiler=char_data.name.alternative_spoiler if char_data.name else [],
-            image_large=char_data.image.large if char_data.image else None,
-            image_medium=char_data.image.medium if char_data.image else None,
-            description=char_data.description,
-            gender=char_data.gender,
-            age=char_data.age,
-            blood_type=char_data.blood_type,
-            birth_year=char_data.date_of_birth.year if char_data.date_of_birth else None,
-            birth_month=char_data.date_of_birth.month if char_data.date_of_birth else None,
-            birth_day=char_data.date_of_birth.day if char_data.date_of_birth else None,
-            is_favourite=char_data.is_favourite,
-            is_favourite_blocked=char_data.is_favourite_blocked,
-            site_url=char_data.site_url,
-            favourites=char_data.favourites,
-            mod_notes=char_data.mod_notes,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
-        )
+    def _create_character_from_data(
+        self, 
+        char_data: PydanticCharacter, 
+        now: Optional[datetime] = None
+    ) -> Character:
+        """
+        Create new character from Pydantic model
+        ORM path for single-character callers; batches go through _insert_character_rows
+        """
+        now = now or datetime.utcnow()
+        character = Character(**_to_row(char_data), created_at=now, updated_at=now)
         
         self.session.add(character)
         self.session.flush()  # Get the ID
@@ -230,45 +310,99 @@ class CharacterRepository:
         return self.session.query(Character).filter(Character.id == id).first()
     
     def get_characters_by_ids(self, character_ids: List[int]) -> List[Character]:
-        """Get multiple characters by IDs"""
-        return self.session.query(Character).filter(
-            Character.id.in_(character_ids)
-        ).all()
+        """
+        Get multiple characters by IDs
+        Rows already loaded in this session are served from the identity map;
+        only the missing IDs hit the database
+        """
+        mapper = inspect(Character)
+        identity_map = self.session.identity_map
+        
+        found, missing = [], []
+        for character_id in character_ids:
+            character = identity_map.get(mapper.identity_key_from_primary_key((character_id,)))
+            if character is not None:
+                found.append(character)
+            else:
+                missing.append(character_id)
+        
+        if missing:
+            found += self.session.query(Character).filter(
+                Character.id.in_(missing)
+            ).all()
+        
+        return found
     
     def get_trending_characters(self, limit: int = 50, gender: str = None) -> List[Character]:
         """Get trending characters, optionally filtered by gender"""
-        query = self.session.query(Character).join(TrendingSnapshot).filter(
-            TrendingSnapshot.date >= datetime.now() - timedelta(days=1)
+        # Latest snapshot per character, so each character appears once
+        latest = select(
+            TrendingSnapshot.character_id,
+            TrendingSnapshot.trending_score,
+            func.row_number().over(
+                partition_by=TrendingSnapshot.character_id,
+                order_by=desc(TrendingSnapshot.date)
+            ).label('rn')
+        ).where(
+            TrendingSnapshot.date >= datetime.utcnow() - timedelta(days=1)
+        ).subquery()
+        
+        query = self.session.query(Character).options(
+            load_only(*_LIST_COLUMNS)
+        ).join(
+            latest, and_(latest.c.character_id == Character.id, latest.c.rn == 1)
         )
         
         if gender:
             query = query.filter(Character.gender == gender)
         
-        return query.order_by(desc(TrendingSnapshot.trending_score)).limit(limit).all()
+        return query.order_by(desc(latest.c.trending_score)).limit(limit).all()
     
-    def get_characters_needing_update(self, max_age_hours: int = 168) -> List[Character]:
-        """Get characters that need data refresh"""
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+    def get_characters_needing_update(
+        self, 
+        max_age_hours: int = 168, 
+        chunk_size: int = 1000
+    ) -> Iterator[Character]:
+        """
+        Stream characters that need data refresh
+        Rows are fetched through a server-side cursor in chunks of `chunk_size`, on a
+        dedicated connection and read-only session: their transaction stays open (and is
+        never committed) until the iteration ends, so this repository's session can still
+        commit progress per chunk. Write changes through the upsert methods, not by
+        mutating the yielded objects
+        """
+        cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
         
-        return self.session.query(Character).filter(
+        query = select(Character).where(
             or_(
                 Character.updated_at.is_(None),
                 Character.updated_at < cutoff_time
             )
-        ).all()
+        ).order_by(
+            Character.updated_at.asc().nullsfirst()
+        ).execution_options(yield_per=chunk_size)
+        
+        with self.session.get_bind().connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                # The cursor lives as long as the iteration: lift the timeout for this
+                # connection's transaction only (rolled back when the connection closes)
+                connection.execute(text("SET LOCAL statement_timeout = 0"))
+            
+            with Session(bind=connection) as stream_session:
+                yield from stream_session.scalars(query)
     
     def search_characters(self, query: str, limit: int = 20) -> List[Character]:
-        """Search characters by name"""
+        """Search characters by name (served by the name_search trigram index)"""
         search_pattern = f"%{query}%"
         
-        return self.session.query(Character).filter(
-            or_(
-                Character.name_full.ilike(search_pattern),
-                Character.name_first.ilike(search_pattern),
-                Character.name_last.ilike(search_pattern),
-                Character.name_native.ilike(search_pattern)
-            )
-        ).order_by(desc(Character.favourites)).limit(limit).all()
+        return self.session.query(Character).options(
+            load_only(*_LIST_COLUMNS)
+        ).filter(
+            Character.name_search.ilike(search_pattern)
+        ).order_by(
+            desc(func.similarity(Character.name_search, query)),
+            desc(Character.favourites)
+        ).limit(limit).all()
     
     def get_character_stats(self) -> Dict[str, Any]:
         """Get character statistics"""
@@ -285,14 +419,33 @@ class CharacterRepository:
             'avg_favourites': self.session.query(func.avg(Character.favourites)).scalar() or 0
         }
     
-    def cleanup_old_characters(self, days_old: int = 365) -> int:
-        """Remove characters not updated in X days"""
-        cutoff_date = datetime.now() - timedelta(days=days_old)
+    def cleanup_old_characters(self, days_old: int = 365, batch_size: int = 10000) -> int:
+        """
+        Remove characters not updated in X days
+        Deletes in capped batches, committing each one to keep WAL and lock footprint small
+        """
+        cutoff_date = datetime.utcnow() - timedelta(days=days_old)
         
-        deleted = self.session.query(Character).filter(
-            Character.updated_at < cutoff_date,
-            Character.favourites < 10  # Only delete unpopular characters
-        ).delete()
+        delete_batch = text(f"""
+            DELETE FROM {Character.__tablename__}
+            WHERE ctid IN (
+                SELECT ctid FROM {Character.__tablename__}
+                WHERE updated_at < :cutoff
+                  AND favourites < 10  -- Only delete unpopular characters
+                LIMIT :batch_size
+            )
+        """)
+        
+        deleted = 0
+        while True:
+            result = self.session.execute(
+                delete_batch, {'cutoff': cutoff_date, 'batch_size': batch_size}
+            )
+            self.session.commit()
+            
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
         
         return deleted
     
@@ -316,6 +469,7 @@ class CharacterRepository:
         media_appearances: List[Dict[str, Any]]
     ):
         """Create character-media relationships"""
+        relation_rows = []
         for media_appearance in media_appearances:
             try:
                 media_id = media_appearance.get('media_id')
@@ -344,22 +498,101 @@ class CharacterRepository:
                     self.session.add(media)
                     self.session.flush()
                 
-                # Create character-media relationship
-                char_media = CharacterMedia(
-                    character_id=character.id,
-                    media_id=media.id,
-                    role=media_appearance.get('role'),
-                    voice_actors=media_appearance.get('voice_actors', []),
-                    media_popularity=media_appearance.get('popularity', 0),
-                    media_favourites=media_appearance.get('favourites', 0),
-                    media_average_score=media_appearance.get('average_score'),
-                    media_trending=media_appearance.get('trending', 0)
-                )
-                self.session.add(char_media)
+                # Collect character-media relationship (written in bulk below)
+                relation_rows.append({
+                    'character_id': character.id,
+                    'media_id': media.id,
+                    'role': media_appearance.get('role'),
+                    'voice_actors': media_appearance.get('voice_actors', []),
+                    'media_popularity': media_appearance.get('popularity', 0),
+                    'media_favourites': media_appearance.get('favourites', 0),
+                    'media_average_score': media_appearance.get('average_score'),
+                    'media_trending': media_appearance.get('trending', 0)
+                })
                 
             except Exception as e:
                 self.logger.error(f"Error creating character-media relation: {e}")
                 continue
+        
+        if relation_rows:
+            self.bulk_upsert_character_media(relation_rows)
+    
+    def bulk_upsert_character_media(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Upsert character-media relations with one server-side statement
+        psycopg 3: COPY into a temp staging table followed by INSERT ... SELECT ... ON CONFLICT;
+        other drivers: executemany of INSERT ... ON CONFLICT (multi-row via insertmanyvalues)
+        Returns number of rows inserted or updated
+        """
+        if not rows:
+            return 0
+        
+        # A (character_id, media_id) pair repeated in one statement makes ON CONFLICT fail
+        rows = list({(row['character_id'], row['media_id']): row for row in rows}.values())
+        now = datetime.utcnow()
+        
+        driver_connection = self.session.connection().connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            if hasattr(cursor, 'copy'):
+                return self._copy_upsert_character_media(cursor, rows, now)
+        
+        stmt = postgres_insert(CharacterMedia.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CharacterMedia.__table__.c.character_id, CharacterMedia.__table__.c.media_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in (*_CHARACTER_MEDIA_COLUMNS[2:], 'updated_at')
+            }
+        )
+        self.session.execute(stmt, [
+            {
+                **{column: row.get(column) for column in _CHARACTER_MEDIA_COLUMNS},
+                'voice_actors': row.get('voice_actors') or [],
+                'created_at': now,
+                'updated_at': now,
+            }
+            for row in rows
+        ])
+        return len(rows)
+    
+    def _copy_upsert_character_media(self, cursor, rows: List[Dict[str, Any]], now: datetime) -> int:
+        """COPY the rows into _cm_stage (psycopg 3 cursor) and merge them with one INSERT ... SELECT"""
+        table = CharacterMedia.__tablename__
+        columns = ', '.join(_CHARACTER_MEDIA_COLUMNS)
+        updates = ', '.join(
+            f"{column} = EXCLUDED.{column}"
+            for column in _CHARACTER_MEDIA_COLUMNS if column not in ('character_id', 'media_id')
+        )
+        
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS _cm_stage
+            (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP
+        """)
+        
+        with cursor.copy(f"COPY _cm_stage ({columns}, created_at, updated_at) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row((
+                    row['character_id'],
+                    row['media_id'],
+                    row.get('role'),
+                    _json_dumps(row.get('voice_actors') or []),
+                    row.get('media_popularity', 0),
+                    row.get('media_favourites', 0),
+                    row.get('media_average_score'),
+                    row.get('media_trending', 0),
+                    now,
+                    now,
+                ))
+        
+        cursor.execute(f"""
+            INSERT INTO {table} ({columns}, created_at, updated_at)
+            SELECT {columns}, created_at, updated_at FROM _cm_stage
+            ON CONFLICT (character_id, media_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+        """)
+        upserted = cursor.rowcount
+        
+        cursor.execute("TRUNCATE _cm_stage")
+        return upserted
     
     def _update_character_media_relations(
         self, 
@@ -436,12 +669,5 @@ class CharacterRepository:
                 self.session.delete(rel)
     
     def _get_media_type_enum(self, media_type_str: str):
-        """Convert string to MediaTypeEnum"""
-        from ..models import MediaTypeEnum
-        
-        if media_type_str == 'ANIME':
-            return MediaTypeEnum.ANIME
-        elif media_type_str == 'MANGA':
-            return MediaTypeEnum.MANGA
-        else:
-            return MediaTypeEnum.ANIME  # Default
+        """Convert string to MediaTypeEnum (defaults to ANIME)"""
+        return _MEDIA_TYPE_MAP.get(media_type_str, MediaTypeEnum.ANIME)
@@ -5,13 +5,45 @@ Gestisce le operazioni database per il lifecycle delle serie
 
 import asyncio
 import asyncpg
+import functools
+import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:  # orjson opzionale: fallback sul modulo json standard
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+if orjson is not None:
+    _json_dumps = lambda value: orjson.dumps(value).decode()
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+def _json_default(value):
+    """Tipi non nativi nelle risposte del repository (Record senza copia intermedia in dict)"""
+    if isinstance(value, asyncpg.Record):
+        return dict(value.items())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps_json(value) -> bytes:
+    """Serializza risultati del repository (Record, liste, dict) direttamente in bytes JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, default=_json_default).encode()
+
 class LifecycleStage(Enum):
     """Stages del lifecycle delle serie"""
     UPCOMING = "upcoming"
@@ -21,251 +53,411 @@ class LifecycleStage(Enum):
     ARCHIVED = "archived"
     READY_FOR_DELETION = "ready_for_deletion"
 
+# Query "calde" del lifecycle: testo SQL costante a livello di modulo, così la
+# statement cache di asyncpg (statement_cache_size del pool) riusa lo statement
+# preparato su ogni connessione invece di ri-parsare e ri-pianificare a ogni chiamata
+SQL_SERIES_BY_STAGE = '''
+    SELECT 
+        id, anilist_id, title, status,
+        lifecycle_stage, grace_period_start, archived_at,
+        popularity, favourites, trending,
+        start_date, end_date, created_at, updated_at,
+        evaluation_score, last_evaluation_at,
+        character_count, avg_character_trending, max_character_trending
+    FROM anilist_media
+    WHERE lifecycle_stage = $1
+    ORDER BY updated_at DESC
+    LIMIT $2
+'''
+
+SQL_EXPIRED_GRACE_PERIOD_SERIES = '''
+    SELECT 
+        id, anilist_id, title, status,
+        lifecycle_stage, grace_period_start, archived_at,
+        popularity, favourites, trending,
+        character_count, avg_character_trending, max_character_trending,
+        EXTRACT(DAYS FROM NOW() - grace_period_start) as days_in_grace
+    FROM anilist_media
+    -- servito da idx_media_grace_sweep (migrations/016)
+    WHERE lifecycle_stage IN ('grace_period', 'extended_grace')
+      AND grace_period_start < NOW() - ($1 * INTERVAL '1 day')
+    ORDER BY grace_period_start ASC
+'''
+
+# Blocco di serie archiviate da marcare per cancellazione; la SELECT interna
+# usa l'indice parziale idx_media_archived_at (migrations/012)
+SQL_MARK_ARCHIVED_FOR_DELETION = '''
+    UPDATE anilist_media 
+    SET lifecycle_stage = 'ready_for_deletion',
+        updated_at = NOW()
+    WHERE id IN (
+        SELECT id FROM anilist_media
+        WHERE lifecycle_stage = 'archived'
+          AND archived_at < NOW() - ($1 * INTERVAL '1 day')
+        LIMIT $2
+    )
+    RETURNING id
+'''
+
+# Ricalcolo periodico degli aggregati personaggi denormalizzati su anilist_media:
+# le letture del lifecycle non fanno più il join ILIKE con characters
+SQL_REFRESH_CHARACTER_STATS = '''
+    UPDATE anilist_media am
+    SET character_count = sub.character_count,
+        avg_character_trending = sub.avg_character_trending,
+        max_character_trending = sub.max_character_trending,
+        character_stats_updated_at = NOW()
+    FROM (
+        SELECT 
+            m.id,
+            COUNT(DISTINCT c.id) as character_count,
+            AVG(COALESCE(c.trending_score, 0)) as avg_character_trending,
+            MAX(COALESCE(c.trending_score, 0)) as max_character_trending
+        FROM anilist_media m
+        -- servito da idx_characters_series_trgm (migrations/005)
+        LEFT JOIN characters c ON c.series ILIKE '%' || m.title || '%'
+        GROUP BY m.id
+    ) sub
+    WHERE am.id = sub.id
+'''
+
+# Campi opzionali via COALESCE e timestamp di stage via CASE: stesso testo SQL per
+# ogni combinazione di argomenti
+SQL_UPDATE_LIFECYCLE_STAGE = '''
+    UPDATE anilist_media
+    SET lifecycle_stage = $2::text,
+        evaluation_score = COALESCE($3::numeric, evaluation_score),
+        lifecycle_notes = COALESCE($4::text, lifecycle_notes),
+        grace_period_start = CASE
+            WHEN $2::text IN ('grace_period', 'extended_grace') THEN NOW()
+            ELSE grace_period_start
+        END,
+        archived_at = CASE WHEN $2::text = 'archived' THEN NOW() ELSE archived_at END,
+        last_evaluation_at = NOW(),
+        updated_at = NOW()
+    WHERE id = $1
+    RETURNING id, title, lifecycle_stage
+'''
+
+# Aggiornamento di più serie: i valori arrivano come tre array paralleli espansi con
+# unnest, così il testo SQL (e lo statement preparato) è uno solo qualunque sia la dimensione
+# del batch e non c'è il limite di 32767 parametri di asyncpg
+SQL_BULK_UPDATE_LIFECYCLE_STAGE = '''
+    UPDATE anilist_media am
+    SET lifecycle_stage = v.stage,
+        evaluation_score = COALESCE(v.score, am.evaluation_score),
+        grace_period_start = CASE
+            WHEN v.stage IN ('grace_period', 'extended_grace') THEN NOW()
+            ELSE am.grace_period_start
+        END,
+        archived_at = CASE WHEN v.stage = 'archived' THEN NOW() ELSE am.archived_at END,
+        last_evaluation_at = NOW(),
+        updated_at = NOW()
+    FROM unnest($1::integer[], $2::text[], $3::numeric[]) AS v(id, stage, score)
+    WHERE am.id = v.id
+    RETURNING am.id, am.title, am.lifecycle_stage
+'''
+
+# Serie candidate all'aggiornamento status precalcolate in mv_series_needing_update
+# (migrations/015): la lettura costa O(risultato) invece di una scansione a ogni polling
+SQL_SERIES_REQUIRING_STATUS_UPDATE = '''
+    SELECT id, anilist_id, title, status, start_date, end_date, updated_at
+    FROM mv_series_needing_update
+    ORDER BY updated_at ASC
+    LIMIT $1
+'''
+
+SQL_REFRESH_SERIES_NEEDING_UPDATE = 'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_series_needing_update'
+
+# Età massima di mv_series_needing_update prima che la lettura la ricalcoli
+SERIES_NEEDING_UPDATE_MAX_AGE_SECONDS = 3600
+
+# Canale NOTIFY del trigger su anilist_media (payload: id della serie)
+SERIES_UPDATE_CHANNEL = 'series_update_needed'
+
+# Canale NOTIFY dei cambi di stage fatti dal repository, per invalidare le cache a valle
+# (payload: id separati da virgola, al massimo NOTIFY_IDS_PER_PAYLOAD per restare sotto gli 8000 byte)
+LIFECYCLE_CHANGES_CHANNEL = 'lifecycle_changes'
+NOTIFY_IDS_PER_PAYLOAD = 1000
+
+# Colonne della query statistiche raggruppate per sezione della risposta
+STATS_SECTIONS = {
+    'base': (
+        'total_series', 'upcoming', 'grace_period', 'extended_grace', 'active_tracking',
+        'archived', 'ready_for_deletion', 'not_yet_released', 'currently_releasing', 'finished',
+    ),
+    'temporal': (
+        'new_in_grace_week', 'archived_this_week', 'evaluated_today', 'avg_evaluation_score',
+    ),
+    'performance': (
+        'avg_popularity', 'avg_favourites', 'avg_trending',
+        'high_popularity_count', 'high_favourites_count',
+    ),
+}
+
+# Status AniList -> chiave della sezione 'base' (gli stage del lifecycle usano il proprio valore)
+STATS_STATUS_KEYS = {
+    'NOT_YET_RELEASED': 'not_yet_released',
+    'RELEASING': 'currently_releasing',
+    'FINISHED': 'finished',
+}
+
+# Index-only scan su idx_media_lifecycle_status (migrations/013)
+SQL_LIFECYCLE_STAGE_STATUS_COUNTS = '''
+    SELECT lifecycle_stage, status, COUNT(*) as n
+    FROM anilist_media
+    GROUP BY lifecycle_stage, status
+'''
+
+# Le statistiche cambiano lentamente: evita di rieseguire la query a ogni polling
+STATS_CACHE_TTL_SECONDS = 60
+
+def _ttl_memoize(ttl_seconds: float):
+    """Memoizza il risultato di un metodo async senza argomenti per `ttl_seconds` (cache per istanza)"""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self):
+            now = time.monotonic()
+            cached = self._memo.get(method.__name__)
+            if cached and now - cached[0] < ttl_seconds:
+                return cached[1]
+            
+            result = await method(self)
+            self._memo[method.__name__] = (now, result)
+            return result
+        return wrapper
+    return decorator
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Codec JSON/JSONB registrati una volta per connessione del pool (decodifica in C con orjson)"""
+    for typename in ('json', 'jsonb'):
+        await conn.set_type_codec(
+            typename,
+            encoder=_json_dumps,
+            decoder=_json_loads,
+            schema='pg_catalog',
+            format='text'
+        )
+
 class SeriesLifecycleRepository:
-    """Repository per operazioni lifecycle delle serie"""
+    """
+    Repository per operazioni lifecycle delle serie
+    Le letture restituiscono asyncpg.Record (mapping read-only: row['title'], row.items())
+    senza copiarli in dict; per serializzarli: dumps_json(rows)
+    """
     
     def __init__(self, database_url: str):
         self.database_url = database_url
+        self._pool: Optional[asyncpg.Pool] = None
+        self._memo: Dict[str, Tuple[float, Any]] = {}
+        self._listener: Optional[asyncpg.Connection] = None
+        # Ultimo refresh di mv_series_needing_update fatto da questa istanza (None = mai)
+        self.series_needing_update_refreshed_at: Optional[datetime] = None
+        self._series_needing_update_lock = asyncio.Lock()
+    
+    async def init_pool(self):
+        """Crea il pool di connessioni condiviso (idempotente)"""
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                self.database_url,
+                min_size=10,
+                max_size=50,
+                max_inactive_connection_lifetime=300,
+                command_timeout=60,
+                statement_cache_size=1024,
+                init=_init_connection
+            )
+        return self._pool
     
-    async def get_connection(self):
-        """Ottieni connessione database"""
-        return await asyncpg.connect(self.database_url)
+    def _acquire(self):
+        """Prendi una connessione dal pool (da usare con `async with`)"""
+        if self._pool is None:
+            raise RuntimeError("Pool not initialized. Call init_pool() first.")
+        return self._pool.acquire()
     
-    async def get_series_by_lifecycle_stage(self, stage: LifecycleStage, limit: int = 50) -> List[Dict]:
+    async def close(self):
+        """Chiudi il pool di connessioni (e la connessione LISTEN, se aperta)"""
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+    
+    async def get_series_by_lifecycle_stage(self, stage: LifecycleStage, limit: int = 50) -> List[asyncpg.Record]:
         """Ottieni serie per stage del lifecycle"""
-        conn = await self.get_connection()
-        
-        try:
-            series = await conn.fetch('''
-                SELECT 
-                    am.id, am.anilist_id, am.title, am.status,
-                    am.lifecycle_stage, am.grace_period_start, am.archived_at,
-                    am.popularity, am.favourites, am.trending,
-                    am.start_date, am.end_date, am.created_at, am.updated_at,
-                    am.evaluation_score, am.last_evaluation_at,
-                    COUNT(DISTINCT c.id) as character_count,
-                    AVG(COALESCE(c.trending_score, 0)) as avg_character_trending,
-                    MAX(COALESCE(c.trending_score, 0)) as max_character_trending
-                FROM anilist_media am
-                LEFT JOIN characters c ON c.series ILIKE '%' || am.title || '%'
-                WHERE am.lifecycle_stage = $1
-                GROUP BY am.id, am.anilist_id, am.title, am.status, 
-                         am.lifecycle_stage, am.grace_period_start, am.archived_at,
-                         am.popularity, am.favourites, am.trending,
-                         am.start_date, am.end_date, am.created_at, am.updated_at,
-                         am.evaluation_score, am.last_evaluation_at
-                ORDER BY am.updated_at DESC
-                LIMIT $2
-            ''', stage.value, limit)
-            
-            return [dict(row) for row in series]
+        async with self._acquire() as conn:
+            series = await conn.fetch(SQL_SERIES_BY_STAGE, stage.value, limit)
             
-        finally:
-            await conn.close()
+            return series
     
-    async def get_expired_grace_period_series(self, grace_days: int = 42) -> List[Dict]:
+    async def get_expired_grace_period_series(self, grace_days: int = 42) -> List[asyncpg.Record]:
         """Ottieni serie con periodo di grazia scaduto"""
-        conn = await self.get_connection()
-        
-        try:
-            series = await conn.fetch('''
-                SELECT 
-                    am.id, am.anilist_id, am.title, am.status,
-                    am.lifecycle_stage, am.grace_period_start, am.archived_at,
-                    am.popularity, am.favourites, am.trending,
-                    COUNT(DISTINCT c.id) as character_count,
-                    AVG(COALESCE(c.trending_score, 0)) as avg_character_trending,
-                    MAX(COALESCE(c.trending_score, 0)) as max_character_trending,
-                    EXTRACT(DAYS FROM NOW() - am.grace_period_start) as days_in_grace
-                FROM anilist_media am
-                LEFT JOIN characters c ON c.series ILIKE '%' || am.title || '%'
-                WHERE am.lifecycle_stage IN ('grace_period', 'extended_grace')
-                  AND am.grace_period_start < NOW() - INTERVAL '{} days'
-                GROUP BY am.id, am.anilist_id, am.title, am.status, 
-                         am.lifecycle_stage, am.grace_period_start, am.archived_at,
-                         am.popularity, am.favourites, am.trending
-                ORDER BY am.grace_period_start ASC
-            '''.format(grace_days))
-            
-            return [dict(row) for row in series]
+        async with self._acquire() as conn:
+            series = await conn.fetch(SQL_EXPIRED_GRACE_PERIOD_SERIES, grace_days)
             
-        finally:
-            await conn.close()
+            return series
     
     async def update_series_lifecycle_stage(self, series_id: int, stage: LifecycleStage, 
                                           evaluation_score: Optional[float] = None,
-                                          notes: Optional[str] = None):
+                                          notes: Optional[str] = None) -> Optional[asyncpg.Record]:
         """Aggiorna lo stage del lifecycle di una serie"""
-        conn = await self.get_connection()
+        async with self._acquire() as conn:
+            result = await conn.fetchrow(
+                SQL_UPDATE_LIFECYCLE_STAGE, series_id, stage.value, evaluation_score, notes or None
+            )
+            return result
+    
+    async def bulk_update_lifecycle_stage(
+        self, 
+        updates: List[Tuple[int, LifecycleStage, Optional[float]]]
+    ) -> List[asyncpg.Record]:
+        """
+        Aggiorna lo stage di più serie con un solo UPDATE ... FROM unnest(...)
+        `updates` è una lista di tuple (series_id, stage, evaluation_score)
+        """
+        if not updates:
+            return []
         
-        try:
-            update_fields = {
-                'lifecycle_stage': stage.value,
-                'last_evaluation_at': 'NOW()',
-                'updated_at': 'NOW()'
-            }
-            
-            if evaluation_score is not None:
-                update_fields['evaluation_score'] = evaluation_score
-            
-            if notes:
-                update_fields['lifecycle_notes'] = notes
-            
-            # Campi speciali per stage specifici
-            if stage == LifecycleStage.GRACE_PERIOD:
-                update_fields['grace_period_start'] = 'NOW()'
-            elif stage == LifecycleStage.EXTENDED_GRACE:
-                update_fields['grace_period_start'] = 'NOW()'
-            elif stage == LifecycleStage.ARCHIVED:
-                update_fields['archived_at'] = 'NOW()'
-            
-            # Costruisci query dinamicamente
-            set_clauses = []
-            values = [series_id]
-            param_count = 2
-            
-            for field, value in update_fields.items():
-                if value == 'NOW()':
-                    set_clauses.append(f"{field} = NOW()")
-                else:
-                    set_clauses.append(f"{field} = ${param_count}")
-                    values.append(value)
-                    param_count += 1
-            
-            query = f'''
-                UPDATE anilist_media 
-                SET {', '.join(set_clauses)}
-                WHERE id = $1
-                RETURNING id, title, lifecycle_stage
-            '''
-            
-            result = await conn.fetchrow(query, *values)
-            return dict(result) if result else None
-            
-        finally:
-            await conn.close()
+        series_ids, stages, scores = zip(*(
+            (series_id, stage.value, evaluation_score)
+            for series_id, stage, evaluation_score in updates
+        ))
+        
+        async with self._acquire() as conn:
+            rows = await conn.fetch(SQL_BULK_UPDATE_LIFECYCLE_STAGE, list(series_ids), list(stages), list(scores))
+            return rows
     
+    @_ttl_memoize(STATS_CACHE_TTL_SECONDS)
     async def get_lifecycle_statistics(self) -> Dict[str, Any]:
-        """Ottieni statistiche complete del lifecycle"""
-        conn = await self.get_connection()
-        
-        try:
-            # Statistiche base
-            base_stats = await conn.fetchrow('''
-                SELECT 
-                    COUNT(*) as total_series,
-                    COUNT(*) FILTER (WHERE lifecycle_stage = 'upcoming') as upcoming,
-                    COUNT(*) FILTER (WHERE lifecycle_stage = 'grace_period') as grace_period,
-                    COUNT(*) FILTER (WHERE lifecycle_stage = 'extended_grace') as extended_grace,
-                    COUNT(*) FILTER (WHERE lifecycle_stage = 'active_tracking') as active_tracking,
-                    COUNT(*) FILTER (WHERE lifecycle_stage = 'archived') as archived,
-                    COUNT(*) FILTER (WHERE lifecycle_stage = 'ready_for_deletion') as ready_for_deletion,
-                    COUNT(*) FILTER (WHERE status = 'NOT_YET_RELEASED') as not_yet_released,
-                    COUNT(*) FILTER (WHERE status = 'RELEASING') as currently_releasing,
-                    COUNT(*) FILTER (WHERE status = 'FINISHED') as finished
-                FROM anilist_media
-            ''')
-            
-            # Statistiche temporali
-            time_stats = await conn.fetchrow('''
+        """Ottieni statistiche complete del lifecycle (memoizzata)"""
+        async with self._acquire() as conn:
+            # Conteggi per stage/status: una riga per coppia, pivot in Python
+            groups = await conn.fetch(SQL_LIFECYCLE_STAGE_STATUS_COUNTS)
+            stats = await conn.fetchrow('''
                 SELECT 
+                    -- Statistiche temporali
                     COUNT(*) FILTER (WHERE grace_period_start > NOW() - INTERVAL '7 days') as new_in_grace_week,
                     COUNT(*) FILTER (WHERE archived_at > NOW() - INTERVAL '7 days') as archived_this_week,
                     COUNT(*) FILTER (WHERE last_evaluation_at > NOW() - INTERVAL '24 hours') as evaluated_today,
-                    AVG(evaluation_score) FILTER (WHERE evaluation_score IS NOT NULL) as avg_evaluation_score
-                FROM anilist_media
+                    AVG(evaluation_score) FILTER (WHERE evaluation_score IS NOT NULL) as avg_evaluation_score,
+                    
+                    -- Statistiche performance (solo serie tracciate)
+                    AVG(popularity) FILTER (WHERE tracked) as avg_popularity,
+                    AVG(favourites) FILTER (WHERE tracked) as avg_favourites,
+                    AVG(trending) FILTER (WHERE tracked) as avg_trending,
+                    COUNT(*) FILTER (WHERE tracked AND popularity > 50) as high_popularity_count,
+                    COUNT(*) FILTER (WHERE tracked AND favourites > 100) as high_favourites_count
+                FROM (
+                    SELECT *,
+                           lifecycle_stage IN ('grace_period', 'extended_grace', 'active_tracking') as tracked
+                    FROM anilist_media
+                ) am
             ''')
             
-            # Statistiche performance
-            perf_stats = await conn.fetchrow('''
-                SELECT 
-                    AVG(popularity) as avg_popularity,
-                    AVG(favourites) as avg_favourites,
-                    AVG(trending) as avg_trending,
-                    COUNT(*) FILTER (WHERE popularity > 50) as high_popularity_count,
-                    COUNT(*) FILTER (WHERE favourites > 100) as high_favourites_count
-                FROM anilist_media
-                WHERE lifecycle_stage IN ('grace_period', 'extended_grace', 'active_tracking')
-            ''')
+            counts = dict.fromkeys(STATS_SECTIONS['base'], 0)
+            for row in groups:
+                counts['total_series'] += row['n']
+                if row['lifecycle_stage'] in counts:
+                    counts[row['lifecycle_stage']] += row['n']
+                status_key = STATS_STATUS_KEYS.get(row['status'])
+                if status_key:
+                    counts[status_key] += row['n']
             
-            return {
-                'base': dict(base_stats),
-                'temporal': dict(time_stats),
-                'performance': dict(perf_stats),
-                'generated_at': datetime.now().isoformat()
-            }
+            result = {'base': counts}
+            for section in ('temporal', 'performance'):
+                result[section] = {key: stats[key] for key in STATS_SECTIONS[section]}
+            result['generated_at'] = datetime.now().isoformat()
+            return result
+    
+    @_ttl_memoize(STATS_CACHE_TTL_SECONDS)
+    async def get_lifecycle_statistics_json(self) -> bytes:
+        """Statistiche del lifecycle già serializzate per l'endpoint (bytes memoizzati)"""
+        return dumps_json(await self.get_lifecycle_statistics())
+    
+    async def get_series_requiring_status_update(self, limit: int = 50) -> List[asyncpg.Record]:
+        """
+        Ottieni serie che potrebbero aver cambiato status su AniList
+        Ricalcola prima la vista se è più vecchia di SERIES_NEEDING_UPDATE_MAX_AGE_SECONDS
+        (freschezza in series_needing_update_refreshed_at)
+        """
+        await self._ensure_series_needing_update_fresh()
+        async with self._acquire() as conn:
+            series = await conn.fetch(SQL_SERIES_REQUIRING_STATUS_UPDATE, limit)
             
-        finally:
-            await conn.close()
+            return series
+    
+    async def refresh_series_requiring_status_update(self):
+        """Ricalcola mv_series_needing_update (non blocca le letture)"""
+        async with self._acquire() as conn:
+            await conn.execute(SQL_REFRESH_SERIES_NEEDING_UPDATE)
+        self.series_needing_update_refreshed_at = datetime.now()
     
-    async def get_series_requiring_status_update(self, limit: int = 50) -> List[Dict]:
-        """Ottieni serie che potrebbero aver cambiato status su AniList"""
-        conn = await self.get_connection()
+    async def _ensure_series_needing_update_fresh(self):
+        """Refresh-on-read: un solo refresh alla volta, gli altri lettori attendono e riusano il risultato"""
+        async with self._series_needing_update_lock:
+            refreshed_at = self.series_needing_update_refreshed_at
+            if (refreshed_at is None or
+                    datetime.now() - refreshed_at > timedelta(seconds=SERIES_NEEDING_UPDATE_MAX_AGE_SECONDS)):
+                await self.refresh_series_requiring_status_update()
+    
+    async def listen_series_updates(self, callback: Callable[[int], Any]):
+        """
+        Ascolta le notifiche del trigger su anilist_media invece di fare polling
+        `callback` riceve l'id della serie; usa una connessione dedicata fuori dal pool
+        """
+        if self._listener is None:
+            self._listener = await asyncpg.connect(self.database_url)
         
-        try:
-            series = await conn.fetch('''
-                SELECT id, anilist_id, title, status, start_date, end_date, updated_at
-                FROM anilist_media
-                WHERE (
-                    -- Serie NOT_YET_RELEASED che potrebbero essere iniziate
-                    (status = 'NOT_YET_RELEASED' AND start_date <= CURRENT_DATE)
-                    OR
-                    -- Serie non aggiornate da più di una settimana
-                    (updated_at < NOW() - INTERVAL '7 days')
-                    OR
-                    -- Serie RELEASING che potrebbero essere finite
-                    (status = 'RELEASING' AND end_date IS NOT NULL AND end_date <= CURRENT_DATE)
-                )
-                ORDER BY updated_at ASC
-                LIMIT $1
-            ''', limit)
-            
-            return [dict(row) for row in series]
-            
-        finally:
-            await conn.close()
+        await self._listener.add_listener(
+            SERIES_UPDATE_CHANNEL,
+            lambda conn, pid, channel, payload: callback(int(payload))
+        )
     
-    async def cleanup_old_archived_series(self, days_threshold: int = 90) -> int:
-        """Marca per cancellazione le serie archiviate da troppo tempo"""
-        conn = await self.get_connection()
+    async def cleanup_old_archived_series(self, days_threshold: int = 90,
+                                          batch_size: int = 1000) -> int:
+        """Marca per cancellazione le serie archiviate da troppo tempo (a blocchi)"""
+        total = 0
+        async with self._acquire() as conn:
+            # Transazioni brevi (autocommit) per blocco: lock limitati e meno tuple morte per volta
+            while True:
+                rows = await conn.fetch(SQL_MARK_ARCHIVED_FOR_DELETION, days_threshold, batch_size)
+                for start in range(0, len(rows), NOTIFY_IDS_PER_PAYLOAD):
+                    await conn.execute(
+                        'SELECT pg_notify($1, $2)',
+                        LIFECYCLE_CHANGES_CHANNEL,
+                        ','.join(str(row['id']) for row in rows[start:start + NOTIFY_IDS_PER_PAYLOAD])
+                    )
+                
+                total += len(rows)
+                if len(rows) < batch_size:
+                    break
         
-        try:
-            result = await conn.execute('''
-                UPDATE anilist_media 
-                SET lifecycle_stage = 'ready_for_deletion',
-                    updated_at = NOW()
-                WHERE lifecycle_stage = 'archived'
-                  AND archived_at < NOW() - INTERVAL '{} days'
-            '''.format(days_threshold))
+        return total
+    
+    async def refresh_character_stats(self) -> int:
+        """Ricalcola gli aggregati personaggi denormalizzati (da eseguire ogni N minuti)"""
+        async with self._acquire() as conn:
+            result = await conn.execute(SQL_REFRESH_CHARACTER_STATS)
             
-            # Estrai il numero di righe aggiornate dal risultato
             return int(result.split()[-1]) if result.startswith('UPDATE') else 0
-            
-        finally:
-            await conn.close()
     
-    async def get_series_performance_history(self, series_id: int, days: int = 30) -> List[Dict]:
+    async def get_series_performance_history(self, series_id: int, days: int = 30) -> List[asyncpg.Record]:
         """Ottieni cronologia performance di una serie (se abbiamo snapshot)"""
-        conn = await self.get_connection()
-        
-        try:
+        async with self._acquire() as conn:
             # Verifica se abbiamo snapshot per questa serie
             snapshots = await conn.fetch('''
                 SELECT 
-                    snapshot_date,
-                    popularity,
-                    favourites,
-                    trending,
-                    created_at
-                FROM anilist_trending_media_snapshots
-                WHERE anilist_id = (
-                    SELECT anilist_id FROM anilist_media WHERE id = $1
-                )
-                AND snapshot_date >= CURRENT_DATE - INTERVAL '{} days'
-                ORDER BY snapshot_date DESC
-            '''.format(days), series_id)
-            
-            return [dict(row) for row in snapshots]
+                    s.snapshot_date,
+                    s.popularity,
+                    s.favourites,
+                    s.trending,
+                    s.created_at
+                FROM anilist_trending_media_snapshots s
+                JOIN anilist_media m ON m.anilist_id = s.anilist_id
+                WHERE m.id = $1
+                  AND s.snapshot_date >= CURRENT_DATE - ($2 * INTERVAL '1 day')
+                ORDER BY s.snapshot_date DESC
+            ''', series_id, days)
             
-        finally:
-            await conn.close()
+            return snapshots
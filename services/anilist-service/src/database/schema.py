@@ -13,11 +13,30 @@ from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
+import os
+import time
 import uuid
 
 Base = declarative_base()
 
 
+def uuid7() -> uuid.UUID:
+    """
+    UUID versione 7 (RFC 9562): 48 bit di timestamp Unix in ms + 74 bit casuali.
+    Ordinato nel tempo: gli insert finiscono sulla foglia più a destra del btree
+    invece che in una pagina casuale come con uuid4
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), 'big')
+    
+    value = (timestamp_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76                       # versione
+    value |= (rand >> 68) << 64              # rand_a, 12 bit
+    value |= 0b10 << 62                      # variante RFC
+    value |= rand & ((1 << 62) - 1)          # rand_b, 62 bit
+    return uuid.UUID(int=value)
+
+
 # ==========================================
 # TABELLE CORE - DATI ANILIST
 # ==========================================
@@ -46,7 +65,8 @@ class AniListCharacter(Base):
     image_medium = Column(String(500), nullable=True)
     
     # Informazioni personaggio
-    description = Column(Text, nullable=True)
+    # HTML di qualche KB: TOAST compresso con lz4 (vedi apply_column_compression)
+    description = Column(Text, nullable=True, info={'compression': 'lz4'})
     gender = Column(String(20), nullable=True, index=True)
     age = Column(String(50), nullable=True)  # Può essere "16-17" o "Unknown"
     blood_type = Column(String(10), nullable=True)
@@ -170,6 +190,12 @@ class AniListMedia(Base):
     # Studios
     studios = Column(JSONB, nullable=True)  # Array di studios
     
+    # Aggregati personaggi denormalizzati (aggiornati ogni 15 minuti da refresh_character_stats, MaintenanceScheduler)
+    character_count = Column(Integer, default=0)
+    avg_character_trending = Column(Float, default=0.0)
+    max_character_trending = Column(Float, default=0.0)
+    character_stats_updated_at = Column(DateTime, nullable=True)
+    
     # Tracking del servizio
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
@@ -233,8 +259,8 @@ class AniListTrendingSnapshot(Base):
     """
     __tablename__ = 'anilist_trending_snapshots'
     
-    # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Primary Key (composta con snapshot_date: la chiave di partizione deve farne parte)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Foreign Keys
     character_id = Column(Integer, ForeignKey('anilist_characters.id'), nullable=True, index=True)
@@ -244,7 +270,7 @@ class AniListTrendingSnapshot(Base):
     entity_type = Column(String(20), nullable=False, index=True)  # 'character', 'media'
     
     # Data e periodo
-    snapshot_date = Column(Date, nullable=False, index=True)
+    snapshot_date = Column(Date, primary_key=True, index=True)  # chiave di partizione
     period_type = Column(String(20), nullable=False, index=True)  # 'daily', 'weekly'
     
     # Ranking ufficiale AniList
@@ -258,7 +284,7 @@ class AniListTrendingSnapshot(Base):
     base_score = Column(Float, nullable=True)
     growth_multiplier = Column(Float, nullable=True)
     series_boost = Column(Float, nullable=True)
-    gender_boost = Column(Float, nullable=True)
+    gender_boost = Column(Float, default=1.0)
     role_boost = Column(Float, nullable=True)
     recency_factor = Column(Float, nullable=True)
     
@@ -266,8 +292,6 @@ class AniListTrendingSnapshot(Base):
     calculation_metadata = Column(JSONB, nullable=True)  # Dettagli extra per debugging
     
     # Componenti del score
-    base_score_old = Column(Float, nullable=False)  # Mantengo per backward compatibility
-    gender_boost = Column(Float, default=1.0)
     recency_boost = Column(Float, default=1.0) 
     quality_boost = Column(Float, default=1.0)
     role_weight = Column(Float, default=1.0)
@@ -275,7 +299,6 @@ class AniListTrendingSnapshot(Base):
     
     # Metadati del calcolo
     algorithm_version = Column(String(10), default="1.0")
-    calculation_metadata = Column(JSONB, nullable=True)
     
     # Dati denormalizzati per performance (character)
     character_name = Column(String(255), nullable=True)
@@ -308,6 +331,8 @@ class AniListTrendingSnapshot(Base):
                         name='uq_trending_entity_date_period'),
         CheckConstraint('(character_id IS NOT NULL) OR (media_id IS NOT NULL)', 
                        name='check_trending_entity_not_null'),
+        # Partizioni mensili create da create_partitioned_tables
+        {'postgresql_partition_by': 'RANGE (snapshot_date)'},
     )
 
 
@@ -318,7 +343,7 @@ class AniListAggregatedData(Base):
     __tablename__ = 'anilist_aggregated_data'
     
     # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Foreign Keys
     character_id = Column(Integer, ForeignKey('anilist_characters.id'), nullable=True, index=True)
@@ -379,7 +404,7 @@ class AniListSyncLog(Base):
     __tablename__ = 'anilist_sync_logs'
     
     # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Info sync
     sync_type = Column(String(20), nullable=False, index=True)  # 'full', 'daily', 'weekly'
@@ -428,7 +453,7 @@ class AniListServiceConfig(Base):
     __tablename__ = 'anilist_service_configs'
     
     # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Versione config
     version = Column(String(20), nullable=False, index=True)
@@ -464,7 +489,7 @@ class ServiceData(Base):
     __tablename__ = 'service_data'
     
     # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Identificazione servizio
     service_name = Column(String(50), nullable=False, index=True)
@@ -473,7 +498,7 @@ class ServiceData(Base):
     # Entità di riferimento
     entity_type = Column(String(50), nullable=False, index=True)  # 'character', 'media', 'user', etc.
     entity_id = Column(String(100), nullable=False, index=True)   # ID dell'entità
-    external_entity_id = Column(Integer, nullable=True, index=True)  # Link a nostre tabelle
+    external_entity_id = Column(Integer, nullable=True)  # Link a nostre tabelle (indice parziale sotto)
     
     # Tipo di dato
     data_type = Column(String(50), nullable=False, index=True)   # 'trending', 'social', 'metrics', etc.
@@ -497,11 +522,22 @@ class ServiceData(Base):
     
     # Indici per query efficienti
     __table_args__ = (
-        Index('idx_service_entity', service_name, entity_type, entity_id),
+        # Covering: SELECT data_payload per entità servita con index-only scan
+        # (payload molto grandi gonfiano l'indice, tenere d'occhio pg_relation_size)
+        Index('idx_service_entity', service_name, entity_type, entity_id,
+              postgresql_include=['data_payload', 'confidence_score']),
         Index('idx_service_data_type', service_name, data_type, data_subtype),
-        Index('idx_service_external_entity', external_entity_id),
-        Index('idx_service_valid_period', valid_from, valid_until),
-        Index('idx_service_created_at', created_at),
+        # Parziali: la maggior parte delle righe ha questi campi NULL
+        Index('idx_service_external_entity', external_entity_id,
+              postgresql_where=external_entity_id.isnot(None)),
+        Index('idx_service_valid_period', valid_from, valid_until,
+              postgresql_where=valid_from.isnot(None)),
+        # Tabella append-mostly: BRIN sui range temporali, molto più piccolo di un btree
+        Index('idx_service_created_at_brin', created_at,
+              postgresql_using='brin', postgresql_with={'pages_per_range': 32}),
+        # Filtri di contenimento data_payload @> '{...}'
+        Index('idx_service_data_payload_gin', data_payload,
+              postgresql_using='gin', postgresql_ops={'data_payload': 'jsonb_path_ops'}),
     )
 
 
@@ -512,7 +548,7 @@ class ServiceMetrics(Base):
     __tablename__ = 'service_metrics'
     
     # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Identificazione
     service_name = Column(String(50), nullable=False, index=True)
@@ -536,9 +572,13 @@ class ServiceMetrics(Base):
     
     # Indici
     __table_args__ = (
-        Index('idx_metrics_service_name_timestamp', service_name, metric_name, timestamp),
+        Index('idx_metrics_service_name_timestamp', service_name, metric_name, timestamp,
+              postgresql_include=['metric_value']),
         Index('idx_metrics_timestamp', timestamp),
         Index('idx_metrics_type', metric_type),
+        # Filtri di contenimento dimensions @> '{...}'
+        Index('idx_metrics_dimensions_gin', dimensions,
+              postgresql_using='gin', postgresql_ops={'dimensions': 'jsonb_path_ops'}),
     )
 
 
@@ -548,15 +588,15 @@ class CharacterFavouritesHistory(Base):
     """
     __tablename__ = 'character_favourites_history'
     
-    # Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Primary Key (composta con recorded_at: la chiave di partizione deve farne parte)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Foreign Keys
     character_id = Column(Integer, ForeignKey('anilist_characters.id'), nullable=False, index=True)
     
     # Dati favourites
     favourites = Column(Integer, nullable=False)
-    recorded_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True, index=True)  # chiave di partizione
     
     # Metadati
     created_at = Column(DateTime(timezone=True), default=func.now())
@@ -568,6 +608,8 @@ class CharacterFavouritesHistory(Base):
     __table_args__ = (
         Index('idx_char_fav_hist_char_date', 'character_id', 'recorded_at'),
         Index('idx_char_fav_hist_recorded', 'recorded_at'),
+        # Partizioni mensili create da create_partitioned_tables
+        {'postgresql_partition_by': 'RANGE (recorded_at)'},
     )
 
 
@@ -600,11 +642,17 @@ class TrendingConfig(Base):
 def create_updated_at_trigger():
     """
     SQL per creare trigger automatico di updated_at
+    Gli UPDATE che non cambiano nessuna colonna (a parte updated_at, impostato anche
+    dall'onupdate ORM) vengono scartati: RETURN NULL in un BEFORE trigger salta la riga,
+    niente WAL né nuove versioni di tupla sui re-sync idempotenti
     """
     return """
     CREATE OR REPLACE FUNCTION update_updated_at_column()
     RETURNS TRIGGER AS $$
     BEGIN
+        IF to_jsonb(NEW) - 'updated_at' IS NOT DISTINCT FROM to_jsonb(OLD) - 'updated_at' THEN
+            RETURN NULL;
+        END IF;
         NEW.updated_at = NOW();
         RETURN NEW;
     END;
@@ -624,51 +672,162 @@ def apply_updated_at_triggers(engine):
         'service_data'
     ]
     
+    # Funzione + trigger di tutte le tabelle in un solo batch e una sola transazione
+    batch_sql = trigger_sql + "".join(
+        f"""
+        DROP TRIGGER IF EXISTS trigger_update_{table}_updated_at ON {table};
+        CREATE TRIGGER trigger_update_{table}_updated_at
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW
+            EXECUTE FUNCTION update_updated_at_column();
+        """
+        for table in tables_with_updated_at
+    )
+    
+    with engine.begin() as conn:
+        conn.execute(text(batch_sql))
+
+def apply_column_compression(engine):
+    """
+    Applica la compressione TOAST dichiarata in Column.info['compression'] (PostgreSQL 14+)
+    Vale per i valori scritti da qui in avanti; STORAGE EXTENDED mantiene la compressione attiva
+    """
+    statements = [
+        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET COMPRESSION {column.info['compression']};"
+        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET STORAGE EXTENDED;"
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if 'compression' in column.info
+    ]
+    
+    if statements:
+        with engine.begin() as conn:
+            conn.execute(text("".join(statements)))
+
+
+# ==========================================
+# VISTE MATERIALIZZATE
+# ==========================================
+
+# Crescita favourites per personaggio su 24h / 7d / 30d (ultimo valore - primo valore della finestra),
+# precalcolata invece di rieseguire le window function sullo storico a ogni richiesta
+FAVOURITES_GROWTH_VIEW_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_character_favourites_growth AS
+SELECT
+    character_id,
+    (ARRAY_AGG(favourites ORDER BY recorded_at DESC))[1] AS current_favourites,
+    (ARRAY_AGG(favourites ORDER BY recorded_at DESC))[1]
+        - (ARRAY_AGG(favourites ORDER BY recorded_at)
+           FILTER (WHERE recorded_at > NOW() - INTERVAL '24 hours'))[1] AS growth_24h,
+    (ARRAY_AGG(favourites ORDER BY recorded_at DESC))[1]
+        - (ARRAY_AGG(favourites ORDER BY recorded_at)
+           FILTER (WHERE recorded_at > NOW() - INTERVAL '7 days'))[1] AS growth_7d,
+    (ARRAY_AGG(favourites ORDER BY recorded_at DESC))[1]
+        - (ARRAY_AGG(favourites ORDER BY recorded_at))[1] AS growth_30d,
+    NOW() AS refreshed_at
+FROM character_favourites_history
+WHERE recorded_at > NOW() - INTERVAL '30 days'
+GROUP BY character_id;
+
+-- Indice univoco richiesto da REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_fav_growth_character
+    ON mv_character_favourites_growth (character_id);
+"""
+
+def create_materialized_views(engine):
+    """
+    Crea le viste materializzate (idempotente, dopo create_all)
+    """
     with engine.connect() as conn:
-        # Crea la funzione
-        conn.execute(text(trigger_sql))
-        
-        # Applica trigger a ogni tabella
-        for table in tables_with_updated_at:
-            trigger_name = f"trigger_update_{table}_updated_at"
-            conn.execute(text(f"""
-                DROP TRIGGER IF EXISTS {trigger_name} ON {table};
-                CREATE TRIGGER {trigger_name}
-                    BEFORE UPDATE ON {table}
-                    FOR EACH ROW
-                    EXECUTE FUNCTION update_updated_at_column();
-            """))
-        
-        # Commit delle modifiche
+        conn.execute(text(FAVOURITES_GROWTH_VIEW_SQL))
         conn.commit()
 
+def refresh_materialized_views(engine):
+    """
+    Aggiorna le viste materializzate senza bloccare le letture
+    Eseguita ogni 15 minuti da MaintenanceScheduler; refreshed_at indica la freschezza dei dati
+    """
+    with engine.begin() as conn:
+        # Il refresh cresce con lo storico: niente statement_timeout (connect_args) in questa transazione
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_character_favourites_growth"))
+
 
 # ==========================================
-# UTILITÀ PER PARTITIONING (futuro)
+# UTILITÀ PER PARTITIONING
 # ==========================================
 
-def create_partitioned_tables(engine):
+# Tabelle time-series partizionate per mese: tabella -> colonna di partizionamento
+PARTITIONED_TABLES = {
+    'anilist_trending_snapshots': 'snapshot_date',    # RANGE (snapshot_date)
+    'character_favourites_history': 'recorded_at',    # RANGE (recorded_at)
+}
+
+def _create_month_partition(conn, table: str, column: str, start: str, end: str, partition: str):
     """
-    Crea tabelle partizionate per trending_snapshots (per data)
-    Utile quando i dati crescono molto
+    Crea la partizione mensile [start, end) di `table` se manca
+    Le righe finite nella DEFAULT per quel mese (partizione non ancora creata al momento
+    dell'insert) impedirebbero il CREATE: la DEFAULT viene staccata, la partizione creata,
+    le righe spostate e la DEFAULT riattaccata, tutto nella transazione del chiamante
     """
-    partition_sql = """
-    -- Partizionamento per anilist_trending_snapshots per mese
-    CREATE TABLE IF NOT EXISTS anilist_trending_snapshots_partitioned (
-        LIKE anilist_trending_snapshots INCLUDING ALL
-    ) PARTITION BY RANGE (snapshot_date);
+    if conn.execute(text("SELECT to_regclass(:name)"), {'name': partition}).scalar() is not None:
+        return
     
-    -- Partizioni per i prossimi mesi (esempio)
-    CREATE TABLE IF NOT EXISTS anilist_trending_snapshots_2024_12 
-        PARTITION OF anilist_trending_snapshots_partitioned
-        FOR VALUES FROM ('2024-12-01') TO ('2025-01-01');
-        
-    CREATE TABLE IF NOT EXISTS anilist_trending_snapshots_2025_01
-        PARTITION OF anilist_trending_snapshots_partitioned  
-        FOR VALUES FROM ('2025-01-01') TO ('2025-02-01');
+    create = f"""
+        CREATE TABLE {partition} PARTITION OF {table}
+            FOR VALUES FROM ('{start}') TO ('{end}')
     """
+    default = f"{table}_default"
+    has_default_rows = (
+        conn.execute(text("SELECT to_regclass(:name)"), {'name': default}).scalar() is not None
+        and conn.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= :start AND {column} < :end)"),
+            {'start': start, 'end': end}
+        ).scalar()
+    )
     
-    # Implementazione futura quando serve performance
+    if not has_default_rows:
+        conn.execute(text(create))
+        return
+    
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    conn.execute(text(create))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {default} WHERE {column} >= :start AND {column} < :end RETURNING *
+        )
+        INSERT INTO {partition} SELECT * FROM moved
+    """), {'start': start, 'end': end})
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+
+def create_partitioned_tables(engine, months_ahead: int = 3):
+    """
+    Crea le partizioni mensili delle tabelle in PARTITIONED_TABLES
+    dal mese corrente a `months_ahead` mesi avanti, più una partizione DEFAULT.
+    Idempotente: eseguita alla creazione tabelle e ogni notte da MaintenanceScheduler
+    (src/schedulers/maintenance_scheduler.py); le righe già finite nella DEFAULT
+    vengono spostate nella partizione del loro mese.
+    Retention: DROP TABLE della partizione del mese invece di DELETE
+    """
+    today = date.today()
+    
+    with engine.begin() as conn:
+        for table, column in PARTITIONED_TABLES.items():
+            year, month = today.year, today.month
+            for _ in range(months_ahead + 1):
+                next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+                _create_month_partition(
+                    conn, table, column,
+                    f"{year}-{month:02d}-01", f"{next_year}-{next_month:02d}-01",
+                    f"{table}_{year}_{month:02d}"
+                )
+                year, month = next_year, next_month
+            
+            # Raccoglie le date fuori dalle partizioni mensili
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {table}_default
+                    PARTITION OF {table} DEFAULT;
+            """))
 
 
 # ==========================================
@@ -689,5 +848,8 @@ __all__ = [
     'CharacterFavouritesHistory',
     'TrendingConfig',
     'apply_updated_at_triggers',
+    'apply_column_compression',
+    'create_materialized_views',
+    'refresh_materialized_views',
     'create_partitioned_tables'
 ]
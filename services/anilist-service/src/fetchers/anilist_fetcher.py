@@ -4,30 +4,572 @@ Servizio completo per il fetching di dati da AniList GraphQL API
 """
 import asyncio
 import aiohttp
+import hashlib
 import logging
 import json
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
-from dataclasses import dataclass
+import random
+import re
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from datetime import datetime
+from dataclasses import dataclass, field
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    _json_dumps = lambda value: json.dumps(value).encode()
+    _json_loads = json.loads
+
+try:
+    import aiodns  # noqa: F401  (enables aiohttp.AsyncResolver)
+    _HAS_AIODNS = True
+except ImportError:  # aiodns is optional, aiohttp falls back to getaddrinfo in a thread
+    _HAS_AIODNS = False
+
+try:
+    import brotli  # noqa: F401  (aiohttp decodes br responses when it is installed)
+    _ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    _ACCEPT_ENCODING = 'gzip, deflate'
+
+try:
+    import httpx
+except ImportError:  # httpx[http2] is optional, only needed with anilist.http2
+    httpx = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional, streaming falls back to a full parse
+    ijson = None
 
 from ..models import AniListConfig
 from ..database.repositories.anilist_character_repository import AniListCharacterRepository
 from ..database.schema import AniListCharacter, AniListMedia
 
 
-@dataclass
+# Selection sizes below: ~1 complexity point per selected field, multiplied by the page size
+# of every list it sits in. Only fields persisted by the repositories are selected; pageInfo
+# asks for hasNextPage alone (total/lastPage make AniList count the whole result set).
+
+# Fields stored in anilist_characters (_CHARACTER_COLUMNS): 22 per character
+_CHARACTER_FIELDS = """
+id
+name {
+    full
+    first
+    middle
+    last
+    native
+    alternative
+    alternativeSpoiler
+}
+image {
+    large
+    medium
+}
+description
+gender
+age
+bloodType
+dateOfBirth {
+    year
+    month
+    day
+}
+favourites
+isFavourite
+isFavouriteBlocked
+siteUrl
+modNotes
+"""
+
+
+def _indent(fields: str, level: int) -> str:
+    """Indent a selection set to sit `level` blocks deep in a query"""
+    return "\n".join("    " * level + line for line in fields.strip().splitlines())
+
+
+# ~22 x perPage
+POPULAR_CHARACTERS_QUERY = """
+query ($page: Int, $perPage: Int) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+        }
+        characters (sort: FAVOURITES_DESC) {
+""" + _indent(_CHARACTER_FIELDS, 3) + """
+        }
+    }
+}
+"""
+
+# Light trending query: only the character fields needed to pick sync candidates (~6 x 10 x perPage)
+TRENDING_MEDIA_LIGHT_QUERY = """
+query ($page: Int, $perPage: Int, $type: MediaType) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+        }
+        media (sort: TRENDING_DESC, type: $type) {
+            id
+            characters (sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    node {
+                        id
+                        name {
+                            full
+                        }
+                        image {
+                            medium
+                        }
+                        favourites
+                    }
+                    characterRole
+                }
+            }
+        }
+    }
+}
+"""
+
+# ~(12 + 23 x 10) x perPage
+TRENDING_MEDIA_QUERY = """
+query ($page: Int, $perPage: Int, $type: MediaType) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+        }
+        media (sort: TRENDING_DESC, type: $type) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            averageScore
+            popularity
+            favourites
+            trending
+            characters (sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    node {
+""" + _indent(_CHARACTER_FIELDS, 6) + """
+                    }
+                    characterRole
+                }
+            }
+        }
+    }
+}
+"""
+
+# ~22 x len(ids), at most 50 ids per operation
+CHARACTERS_BY_IDS_QUERY = """
+query ($ids: [Int], $perPage: Int) {
+    Page (page: 1, perPage: $perPage) {
+        characters (id_in: $ids) {
+""" + _indent(_CHARACTER_FIELDS, 3) + """
+        }
+    }
+}
+"""
+
+# ~22, plus any opt-in detail fields (see _character_by_id_query)
+CHARACTER_BY_ID_QUERY = """
+query ($id: Int) {
+    Character (id: $id) {
+""" + _indent(_CHARACTER_FIELDS, 2) + """
+    }
+}
+"""
+
+
+@lru_cache(maxsize=16)
+def _character_by_id_query(fields: frozenset) -> str:
+    """CHARACTER_BY_ID_QUERY with extra selections for detail pages, built once per field set"""
+    if not fields:
+        return CHARACTER_BY_ID_QUERY
+    extra = "\n".join(sorted(fields))
+    return CHARACTER_BY_ID_QUERY.replace("\n    }\n}\n", "\n" + _indent(extra, 2) + "\n    }\n}\n", 1)
+
+
+# Automatic Persisted Queries: sha256 of each static query, computed once at import
+_QUERY_HASHES = {
+    query: hashlib.sha256(query.encode()).hexdigest()
+    for query in (
+        POPULAR_CHARACTERS_QUERY,
+        TRENDING_MEDIA_LIGHT_QUERY,
+        TRENDING_MEDIA_QUERY,
+        CHARACTERS_BY_IDS_QUERY,
+        CHARACTER_BY_ID_QUERY,
+    )
+}
+
+
+def _query_hash(query: str) -> str:
+    """sha256 of a query, precomputed for the static ones"""
+    return _QUERY_HASHES.get(query) or hashlib.sha256(query.encode()).hexdigest()
+
+
+def _cache_key(query: str, variables: Dict[str, Any]) -> tuple:
+    """Hashable response-cache key; list variables (e.g. id_in) become tuples"""
+    return (
+        _query_hash(query),
+        tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in variables.items()
+        ))
+    )
+
+
+# Transient server errors worth retrying (429 is handled separately)
+_RETRY_STATUSES = frozenset((502, 503, 504))
+
+
+def _persisted_query_error(response_data: Dict[str, Any]) -> Optional[str]:
+    """Return 'PersistedQueryNotFound' / 'PersistedQueryNotSupported' if the server sent one"""
+    for error in response_data.get("errors") or ():
+        code = (error.get("extensions") or {}).get("code", "")
+        message = error.get("message", "")
+        if code == "PERSISTED_QUERY_NOT_FOUND" or message == "PersistedQueryNotFound":
+            return "PersistedQueryNotFound"
+        if code == "PERSISTED_QUERY_NOT_SUPPORTED" or message == "PersistedQueryNotSupported":
+            return "PersistedQueryNotSupported"
+    return None
+
+
+# One HTTP session per event loop (in practice per process), shared by every fetcher: all
+# requests go to the same host, so its TLS connections stay alive between fetcher instances
+# and sync runs. Sessions and locks belong to the loop they were created on, so a new loop
+# (another asyncio.run(), a per-test loop) gets its own; entries go away with their loop
+_SESSIONS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_SESSION_LOCKS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+_SESSION_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+    'Accept-Encoding': _ACCEPT_ENCODING,
+    'Connection': 'keep-alive'
+}
+
+# Errors after which a request is retried (see _post_graphql)
+_TRANSPORT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError) + (
+    (httpx.TransportError,) if httpx is not None else ()
+)
+
+
+class _HTTP2Session:
+    """
+    httpx.AsyncClient(http2=True) behind the subset of the aiohttp session API used here:
+    `async with session.post(url, data=...) as response` with status, headers, read()
+    and content.iter_chunked(). Every request is a stream on one multiplexed connection
+    """
+    
+    def __init__(self, client: "httpx.AsyncClient"):
+        self.client = client
+    
+    @property
+    def closed(self) -> bool:
+        return self.client.is_closed
+    
+    async def close(self):
+        await self.client.aclose()
+    
+    def post(self, url: str, data: bytes) -> "_HTTP2Response":
+        return _HTTP2Response(self.client, url, data)
+
+
+class _HTTP2Response:
+    """aiohttp-shaped view of a streamed httpx response"""
+    
+    def __init__(self, client: "httpx.AsyncClient", url: str, data: bytes):
+        self._stream = client.stream("POST", url, content=data)
+        self._response = None
+        self.status = 0
+        self.headers = {}
+        self.content = self
+    
+    async def __aenter__(self):
+        self._response = await self._stream.__aenter__()
+        self.status = self._response.status_code
+        self.headers = self._response.headers
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._stream.__aexit__(exc_type, exc_val, exc_tb)
+    
+    async def read(self) -> bytes:
+        return await self._response.aread()
+    
+    def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        return self._response.aiter_bytes(size)
+
+
+async def _prime_dns_cache(connector: aiohttp.TCPConnector, url: str):
+    """Resolve the API host once so the first request does not pay for the lookup"""
+    parts = urlsplit(url)
+    try:
+        await connector._resolve_host(parts.hostname, parts.port or 443)
+    except Exception as e:  # best effort: a failure here is retried by the first request
+        logging.getLogger(__name__).debug("DNS prefetch for %s failed: %r", parts.hostname, e)
+
+
+def _session_lock(loop: asyncio.AbstractEventLoop) -> asyncio.Lock:
+    """Lock guarding the shared session of `loop`"""
+    lock = _SESSION_LOCKS.get(loop)
+    if lock is None:
+        lock = _SESSION_LOCKS[loop] = asyncio.Lock()
+    return lock
+
+
+async def _get_session(config: AniListConfig) -> aiohttp.ClientSession:
+    """
+    Return the running loop's shared AniList session, creating it on first use
+    (httpx HTTP/2 with anilist.http2). Cheap once created: a dict lookup, no lock
+    """
+    loop = asyncio.get_running_loop()
+    session = _SESSIONS.get(loop)
+    if session is not None and not session.closed:
+        return session
+    
+    async with _session_lock(loop):
+        session = _SESSIONS.get(loop)
+        if session is None or session.closed:
+            if config.anilist.http2 and httpx is not None:
+                # One TLS connection, concurrent requests multiplexed as HTTP/2 streams
+                session = _SESSIONS[loop] = _HTTP2Session(httpx.AsyncClient(
+                    http2=True,
+                    timeout=config.anilist.request_timeout,
+                    limits=httpx.Limits(
+                        max_connections=config.anilist.max_concurrent_requests,
+                        max_keepalive_connections=config.anilist.max_concurrent_requests,
+                        keepalive_expiry=75
+                    ),
+                    # Connection is a hop-by-hop header, not allowed in HTTP/2
+                    headers={k: v for k, v in _SESSION_HEADERS.items() if k != 'Connection'}
+                ))
+                return session
+            
+            connector = aiohttp.TCPConnector(
+                limit=config.anilist.max_concurrent_requests,
+                limit_per_host=config.anilist.max_concurrent_requests,
+                keepalive_timeout=75,
+                ttl_dns_cache=300,
+                use_dns_cache=True,
+                resolver=aiohttp.AsyncResolver() if _HAS_AIODNS else None,
+                enable_cleanup_closed=True,
+                force_close=False
+            )
+            await _prime_dns_cache(connector, config.anilist.api_url)
+            session = _SESSIONS[loop] = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=config.anilist.request_timeout),
+                connector=connector,
+                headers=_SESSION_HEADERS
+            )
+        return session
+
+
+_OPERATION_RE = re.compile(r'^\s*query\s*\((?P<decls>[^)]*)\)\s*\{(?P<body>.*)\}\s*$', re.DOTALL)
+_VARIABLE_RE = re.compile(r'\$(\w+)')
+
+
+@lru_cache(maxsize=32)
+def _batched_query(query: str, count: int) -> tuple:
+    """
+    Merge `count` copies of a single-root-field query into one document using aliases:
+    `query ($page: Int) { Page (page: $page) {...} }` becomes
+    `query ($page_0: Int, $page_1: Int) { op0: Page (page: $page_0) {...} op1: Page (...) {...} }`
+    Returns (merged query, root field name). Built once per (query, count).
+    """
+    match = _OPERATION_RE.match(query)
+    if not match:
+        raise ValueError("Only `query (...) { Root {...} }` documents can be batched")
+    
+    decls, body = match.group('decls'), match.group('body').strip()
+    root_field = re.match(r'\w+', body).group(0)
+    
+    merged_decls = ", ".join(
+        _VARIABLE_RE.sub(rf'$\1_{i}', decls.strip()) for i in range(count)
+    )
+    merged_body = "\n".join(
+        f"op{i}: " + _VARIABLE_RE.sub(rf'$\1_{i}', body) for i in range(count)
+    )
+    return f"query ({merged_decls}) {{\n{merged_body}\n}}", root_field
+
+
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\.\.\.|[$\w]+|[{}()\[\]:]')
+_OPEN_TOKENS = frozenset('([{')
+_CLOSE_TOKENS = frozenset(')]}')
+_SLICE_ARGS = frozenset(('perPage', 'first'))
+_DEFAULT_SLICE = 50  # AniList's perPage ceiling, assumed when the size is not known
+
+
+@lru_cache(maxsize=64)
+def _query_tokens(query: str) -> tuple:
+    return tuple(_TOKEN_RE.findall(query))
+
+
+def _slice_size(token: str, variables: Dict[str, Any]) -> int:
+    """Value of a perPage/first argument, literal or `$variable`"""
+    value = variables.get(token[1:]) if token.startswith('$') else (int(token) if token.isdigit() else None)
+    return value if isinstance(value, int) and value > 0 else _DEFAULT_SLICE
+
+
+def _estimate_complexity(query: str, variables: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Static cost of a query as a weighted recursive sum: every field costs 1 plus the cost
+    of its selection, multiplied by the list size when the field takes perPage/first.
+    An upper bound of AniList's scoring, used to keep batched documents under budget
+    """
+    tokens = _query_tokens(query)
+    variables = variables or {}
+    
+    def selection(i: int) -> tuple:
+        # tokens[i] is the opening brace of a selection set
+        cost = 0
+        i += 1
+        while tokens[i] != '}':
+            if tokens[i] == '...':
+                if tokens[i + 1] != 'on':  # named fragment spread
+                    cost += 1
+                    i += 2
+                    continue
+                child, i = selection(i + 3)  # inline fragment: ... on Type { }
+                cost += child
+                continue
+            
+            i += 1
+            if tokens[i] == ':':  # alias: name
+                i += 2
+            
+            multiplier = 1
+            if tokens[i] == '(':
+                depth = 0
+                while True:
+                    token = tokens[i]
+                    if token in _OPEN_TOKENS:
+                        depth += 1
+                    elif token in _CLOSE_TOKENS:
+                        depth -= 1
+                    elif depth == 1 and token in _SLICE_ARGS and tokens[i + 1] == ':':
+                        multiplier = _slice_size(tokens[i + 2], variables)
+                    i += 1
+                    if depth == 0:
+                        break
+            
+            if tokens[i] == '{':
+                child, i = selection(i)
+                cost += 1 + multiplier * child
+            else:
+                cost += 1
+        return cost, i + 1
+    
+    return selection(tokens.index('{'))[0]
+
+
+# Worst-case cost of each static query (sizes at _DEFAULT_SLICE)
+_QUERY_COMPLEXITY = {query: _estimate_complexity(query) for query in _QUERY_HASHES}
+
+
+@dataclass(slots=True)
 class RateLimitState:
-    """Track rate limiting state"""
-    last_request_time: datetime
-    requests_in_window: int
-    window_start: datetime
+    """Token bucket for AniList requests (monotonic clock, shared by concurrent callers)"""
+    capacity: float
+    rate: float  # tokens per second
+    tokens: float
+    last_refill: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass(slots=True)
+class _LeakyBucket:
+    """
+    Metered leaky bucket (counter only, no queue): the level drains at `drip_rate` per second
+    and callers sleep once it reaches `burst`, so sustained traffic is spread evenly
+    """
+    burst: float
+    drip_rate: float
+    level: float = 0.0
+    last_drip: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
     
-    def __post_init__(self):
-        now = datetime.now()
-        if not hasattr(self, 'last_request_time'):
-            self.last_request_time = now
-        if not hasattr(self, 'window_start'):
-            self.window_start = now
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            self.level = max(0.0, self.level - (now - self.last_drip) * self.drip_rate)
+            self.last_drip = now
+            
+            if self.level >= self.burst:
+                await asyncio.sleep((self.level - self.burst + 1) / self.drip_rate)
+                self.level = max(0.0, self.level - (time.monotonic() - self.last_drip) * self.drip_rate)
+                self.last_drip = time.monotonic()
+            
+            self.level += 1
+
+
+@dataclass(slots=True)
+class _DataLoader:
+    """
+    Coalesce concurrent load(key) calls into one batch_load(keys) call (DataLoader semantics):
+    keys queued within wait_ms, or until max_batch of them are queued, share a single request.
+    batch_load returns {key: value}; keys missing from it resolve to None
+    """
+    batch_load: Callable[[List[Any]], Awaitable[Dict[Any, Any]]]
+    max_batch: int = 25
+    wait_ms: float = 5.0
+    pending: Dict[Any, asyncio.Future] = field(default_factory=dict)
+    timer: Optional[asyncio.TimerHandle] = None
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+    
+    def load(self, key: Any) -> "asyncio.Future":
+        future = self.pending.get(key)
+        if future is None:  # the same key within a tick shares one future
+            loop = asyncio.get_running_loop()
+            future = self.pending[key] = loop.create_future()
+            if len(self.pending) >= self.max_batch:
+                self._dispatch()
+            elif self.timer is None:
+                self.timer = loop.call_later(self.wait_ms / 1000, self._dispatch)
+        return future
+    
+    def _dispatch(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            # Keep a reference so the task is not garbage collected mid-flight
+            task = asyncio.ensure_future(self._resolve(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    async def _resolve(self, batch: Dict[Any, asyncio.Future]):
+        try:
+            results = await self.batch_load(list(batch))
+        except BaseException as e:
+            # Waiters must not hang: a cancelled batch cancels their futures, errors propagate
+            for future in batch.values():
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        
+        for key, future in batch.items():
+            if not future.done():  # a caller may have been cancelled
+                future.set_result(results.get(key))
 
 
 class AniListFetcher:
@@ -37,246 +579,481 @@ class AniListFetcher:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.session: Optional[aiohttp.ClientSession] = None
-        self.rate_limit_state = RateLimitState(
-            last_request_time=datetime.now(),
-            requests_in_window=0,
-            window_start=datetime.now()
-        )
+        capacity = float(config.anilist.rate_limit_per_minute)
+        self.rate_limit_state = RateLimitState(capacity=capacity, rate=capacity / 60, tokens=capacity)
+        # The token bucket caps requests per minute; the leaky bucket smooths them within
+        # the minute and the semaphore caps how many GraphQL operations are in flight
+        self.leaky_bucket = _LeakyBucket(burst=float(config.anilist.rate_limit_burst), drip_rate=capacity / 60)
+        self.in_flight = asyncio.Semaphore(config.anilist.max_concurrent_requests)
+        self.persisted_queries = config.anilist.persisted_queries
+        # LRU of successful responses: (query_hash, variables) -> (stored_at, data)
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Concurrent fetch_character_by_id calls are merged into one id_in request
+        self._character_loader = _DataLoader(self._batch_load_characters, max_batch=25, wait_ms=5)
+        # Per-request events are counted here instead of logged, see log_stats
+        self.stats: Dict[str, int] = {
+            "requests": 0, "cache_hits": 0, "rate_limit_waits": 0, "retries": 0, "failures": 0
+        }
         
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.config.anilist.request_timeout),
-            connector=aiohttp.TCPConnector(limit=self.config.anilist.max_concurrent_requests),
-            headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
-        )
+        self.session = await _get_session(self.config)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit"""
-        if self.session:
-            await self.session.close()
+        """Async context manager exit (the shared session stays open, see aclose)"""
+        self.session = None
+        self.log_stats()
+    
+    def log_stats(self):
+        """Emit the request counters in a single record"""
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("AniList requests: %(requests)d sent, %(cache_hits)d cached, "
+                             "%(rate_limit_waits)d rate-limit waits, %(retries)d retries, "
+                             "%(failures)d failures", self.stats)
+    
+    @staticmethod
+    async def aclose():
+        """
+        Close the running loop's shared AniList session, call once at application shutdown
+        (before the loop ends, e.g. in the finally of the coroutine passed to asyncio.run)
+        """
+        loop = asyncio.get_running_loop()
+        async with _session_lock(loop):
+            session = _SESSIONS.pop(loop, None)
+            if session is not None and not session.closed:
+                await session.close()
     
     async def _wait_for_rate_limit(self):
-        """Wait if necessary to respect rate limits"""
-        now = datetime.now()
-        
-        # Reset window if enough time has passed
-        if now - self.rate_limit_state.window_start >= timedelta(seconds=60):
-            self.rate_limit_state.window_start = now
-            self.rate_limit_state.requests_in_window = 0
-        
-        # Check if we need to wait
-        if self.rate_limit_state.requests_in_window >= self.config.anilist.rate_limit_per_minute:
-            wait_time = 60 - (now - self.rate_limit_state.window_start).total_seconds()
-            if wait_time > 0:
-                self.logger.info(f"Rate limit reached, waiting {wait_time:.2f} seconds")
-                await asyncio.sleep(wait_time)
-                self.rate_limit_state.window_start = datetime.now()
-                self.rate_limit_state.requests_in_window = 0
+        """Take one token, sleeping until the bucket refills if it is empty"""
+        state = self.rate_limit_state
+        
+        # Serialize callers so concurrent requests cannot spend the same token
+        async with state.lock:
+            while True:
+                now = time.monotonic()
+                state.tokens = min(state.capacity, state.tokens + (now - state.last_refill) * state.rate)
+                state.last_refill = now
+                
+                if state.tokens >= 1:
+                    state.tokens -= 1
+                    return
+                
+                # Refill again after the sleep instead of assuming one token: a 429 seen
+                # meanwhile may have put the bucket into debt (see _drain_rate_limit)
+                self.stats["rate_limit_waits"] += 1
+                await asyncio.sleep((1 - state.tokens) / state.rate)
+    
+    def _drain_rate_limit(self, retry_after: float):
+        """After a 429, push the bucket into debt so every caller waits out Retry-After"""
+        state = self.rate_limit_state
+        state.tokens = min(state.tokens, 1 - retry_after * state.rate)
+        state.last_refill = time.monotonic()
     
     async def _execute_query(self, query: str, variables: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Execute GraphQL query with rate limiting and error handling"""
-        if not self.session:
-            raise RuntimeError("Session not initialized. Use async context manager.")
+        """
+        Execute GraphQL query with rate limiting and error handling
+        Repeated (query, variables) within cache_ttl_seconds are served from the in-process
+        LRU cache without touching the network or the rate limit
+        """
+        key = _cache_key(query, variables)
+        cached = self._cache.get(key)
+        if cached is not None:
+            if time.monotonic() - cached[0] < self.config.anilist.cache_ttl_seconds:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return dict(cached[1])
+            del self._cache[key]
         
-        await self._wait_for_rate_limit()
+        response_data = await self._post_graphql(query, variables)
+        if response_data is None:
+            return None
+        
+        if "errors" in response_data:
+            self.logger.error(f"GraphQL errors: {response_data['errors']}")
+            return None
+        
+        data = response_data.get("data")
+        if data is not None and self.config.anilist.cache_max > 0:
+            self._cache[key] = (time.monotonic(), data)
+            if len(self._cache) > self.config.anilist.cache_max:
+                self._cache.popitem(last=False)
+        return data
+    
+    async def _make_request(self, query: str, variables: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Alias of _execute_query used by the specialized fetchers"""
+        return await self._execute_query(query, variables)
+    
+    def invalidate(self, query: Optional[str] = None):
+        """Drop cached responses, all of them or only those of `query`"""
+        if query is None:
+            self._cache.clear()
+            return
+        
+        query_hash = _query_hash(query)
+        for key in [key for key in self._cache if key[0] == query_hash]:
+            del self._cache[key]
+    
+    async def _execute_batch(self, query: str, variables_list: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Run the same query once per variables dict in a single HTTP request (aliased fields)
+        Returns one `{RootField: ...}` result per input, None where that operation failed.
+        Keep len(variables_list) within config.anilist.max_batch_ops: the merged query's
+        complexity is the sum of its operations and AniList rejects it as a whole, so
+        batches over config.anilist.complexity_budget are split before sending
+        """
+        if not variables_list:
+            return []
+        if len(variables_list) == 1:
+            return [await self._execute_query(query, variables_list[0])]
         
-        payload = {
-            "query": query,
-            "variables": variables
+        groups = self._split_by_complexity(query, variables_list)
+        if len(groups) > 1:
+            results = await asyncio.gather(*(self._execute_batch(query, group) for group in groups))
+            return [result for group_results in results for result in group_results]
+        
+        merged_query, root_field = _batched_query(query, len(variables_list))
+        merged_variables = {
+            f"{name}_{i}": value
+            for i, variables in enumerate(variables_list)
+            for name, value in variables.items()
         }
         
-        try:
-            self.rate_limit_state.requests_in_window += 1
-            self.rate_limit_state.last_request_time = datetime.now()
+        response_data = await self._post_graphql(merged_query, merged_variables)
+        if response_data is None:
+            return [None] * len(variables_list)
+        
+        # Partial failures: failed aliases come back null, the others are still usable
+        if "errors" in response_data:
+            self.logger.error(f"GraphQL errors in batch: {response_data['errors']}")
+        
+        data = response_data.get("data") or {}
+        return [
+            {root_field: data[f"op{i}"]} if data.get(f"op{i}") is not None else None
+            for i in range(len(variables_list))
+        ]
+    
+    def _split_by_complexity(self, query: str, variables_list: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group consecutive operations so each group's estimated complexity fits the budget"""
+        budget = self.config.anilist.complexity_budget
+        worst_case = _QUERY_COMPLEXITY.get(query)
+        if worst_case is not None and worst_case * len(variables_list) <= budget:
+            return [variables_list]
+        
+        groups, group, group_cost = [], [], 0
+        for variables in variables_list:
+            cost = _estimate_complexity(query, variables)
+            if cost > budget:
+                self.logger.warning("Query complexity %d exceeds budget %d, sending it on its own", cost, budget)
+            if group and group_cost + cost > budget:
+                groups.append(group)
+                group, group_cost = [], 0
+            group.append(variables)
+            group_cost += cost
+        groups.append(group)
+        return groups
+    
+    async def _post_graphql(self, query: str, variables: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        POST a GraphQL document and return the decoded response body (data and errors)
+        429, 502/503/504 and connection errors are retried up to max_retries times with
+        exponential backoff and full jitter. With persisted queries on, static queries are
+        sent as their hash only; the full text follows only when the server does not know it
+        """
+        # Always re-read: the shared session may have been closed or belong to another loop
+        self.session = await _get_session(self.config)
+        
+        send_query = False
+        max_retries = self.config.anilist.max_retries
+        
+        for attempt in range(max_retries):
+            await self._wait_for_rate_limit()
+            await self.leaky_bucket.acquire()
             
-            async with self.session.post(self.config.anilist.api_url, json=payload) as response:
-                
-                if response.status == 429:  # Rate limit
-                    retry_after = int(response.headers.get('Retry-After', 60))
-                    self.logger.warning(f"Rate limited, waiting {retry_after} seconds")
-                    await asyncio.sleep(retry_after)
-                    return await self._execute_query(query, variables)
+            query_hash = _QUERY_HASHES.get(query) if self.persisted_queries else None
+            hash_only = query_hash is not None and not send_query
+            
+            payload = {"variables": variables}
+            if not hash_only:
+                payload["query"] = query
+            if query_hash is not None:
+                payload["extensions"] = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+            
+            backoff_base = None
+            self.stats["requests"] += 1
+            try:
+                async with self.in_flight:
+                    # Content-Type: application/json is set on the session
+                    async with self.session.post(self.config.anilist.api_url, data=_json_dumps(payload)) as response:
+                        
+                        if response.status == 429:  # Rate limit
+                            retry_after = int(response.headers.get('Retry-After', 60))
+                            self.logger.warning("Rate limited, waiting %d seconds", retry_after)
+                            # Every caller waits out Retry-After in _wait_for_rate_limit
+                            self._drain_rate_limit(retry_after)
+                            backoff_base = max(1, retry_after)
+                        
+                        elif response.status in _RETRY_STATUSES:
+                            self.logger.warning("AniList API error: %d, retrying", response.status)
+                            backoff_base = 1
+                        
+                        elif hash_only and response.status in (200, 400):
+                            response_data = _json_loads(await response.read())
+                            persisted_error = _persisted_query_error(response_data)
+                            if persisted_error is None:
+                                return response_data
+                            
+                            if persisted_error == "PersistedQueryNotSupported":
+                                self.logger.warning("AniList does not support persisted queries, sending full queries")
+                                self.persisted_queries = False
+                            send_query = True
+                        
+                        elif response.status != 200:
+                            self.logger.error(f"AniList API error: {response.status}")
+                            return None
+                        
+                        else:
+                            return _json_loads(await response.read())
                 
-                if response.status != 200:
-                    self.logger.error(f"AniList API error: {response.status}")
-                    return None
+            except _TRANSPORT_ERRORS as e:
+                self.logger.warning("Connection to AniList failed: %r, retrying", e)
+                backoff_base = 1
+            except json.JSONDecodeError as e:  # orjson.JSONDecodeError is a subclass
+                self.logger.error(f"Failed to decode JSON response: {e}")
+                return None
+            except Exception as e:
+                self.logger.error(f"Failed to fetch from AniList: {e}")
+                return None
+            
+            # Full jitter: concurrent retries spread out instead of tripping the limiter together
+            if backoff_base is not None and attempt + 1 < max_retries:
+                self.stats["retries"] += 1
+                cap = self.config.anilist.retry_backoff_cap
+                await asyncio.sleep(random.uniform(0, min(cap, backoff_base * 2 ** attempt)))
+        
+        self.stats["failures"] += 1
+        self.logger.error("Giving up on AniList request after %d attempts", max_retries)
+        return None
+    
+    async def stream_items(self, query: str, variables: Dict[str, Any], prefix: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the array items at `prefix` (e.g. "data.Page.media.item") while the body is still downloading,
+        so only one item at a time is materialized. Without ijson, or when the response is not a plain 200,
+        the request goes through _execute_query (retries, cache) and the items are yielded from the full parse
+        """
+        if ijson is None:
+            async for item in self._items_from_query(query, variables, prefix):
+                yield item
+            return
+        
+        # Always re-read: the shared session may have been closed or belong to another loop
+        self.session = await _get_session(self.config)
+        
+        await self._wait_for_rate_limit()
+        await self.leaky_bucket.acquire()
+        
+        async with self.in_flight:
+            async with self.session.post(self.config.anilist.api_url, data=_json_dumps({"query": query, "variables": variables})) as response:
+                if response.status == 200:
+                    items = ijson.sendable_list()
+                    parser = ijson.items_coro(items, prefix, use_float=True)
+                    async for chunk in response.content.iter_chunked(65536):
+                        parser.send(chunk)
+                        for item in items:
+                            yield item
+                        del items[:]
+                    parser.close()
+                    for item in items:
+                        yield item
+                    return
                 
-                response_data = await response.json()
+                if response.status == 429:
+                    self._drain_rate_limit(int(response.headers.get('Retry-After', 60)))
+        
+        # Nothing was yielded yet, so the buffered path can retry the whole request
+        async for item in self._items_from_query(query, variables, prefix):
+            yield item
+    
+    async def _items_from_query(self, query: str, variables: Dict[str, Any], prefix: str) -> AsyncIterator[Dict[str, Any]]:
+        """Buffered fallback of stream_items: walk `prefix` in the fully parsed response"""
+        node = await self._execute_query(query, variables)
+        for key in prefix.split(".")[1:-1]:  # "data" is already unwrapped, "item" marks the array
+            if not isinstance(node, dict):
+                return
+            node = node.get(key)
+        for item in node or []:
+            yield item
+    
+    @staticmethod
+    def _pages_for(limit: int, per_page: int, max_pages: Optional[int] = None) -> int:
+        """
+        Pages to request for `limit` items at `per_page` each, capped by `max_pages` if given:
+        a larger max_pages would only fetch pages whose items get dropped
+        """
+        if limit <= 0:
+            raise ValueError(f"limit must be positive, got {limit}")
+        needed_pages = -(-limit // per_page)
+        return min(max_pages, needed_pages) if max_pages else needed_pages
+    
+    async def iter_pages(
+        self,
+        query: str,
+        variables: Dict[str, Any],
+        data_key: str,
+        page_size: int = 50,
+        max_pages: Optional[int] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Yield paginated results in page order, stopping on the last page
+        Up to max_concurrent_requests pages are kept in flight; a query that selects
+        pageInfo.lastPage also stops prefetching past it. Pacing is left to the rate limiters
+        in _post_graphql
+        """
+        window = max(1, self.config.anilist.max_concurrent_requests)
+        last_page = max_pages
+        next_page = 1
+        pending = deque()
+        
+        def schedule(limit: int):
+            nonlocal next_page
+            while len(pending) < limit and (not last_page or next_page <= last_page):
+                page_variables = {**variables, 'page': next_page, 'perPage': page_size}
+                pending.append((next_page, asyncio.ensure_future(self._execute_query(query, page_variables))))
+                next_page += 1
+        
+        schedule(1)
+        try:
+            while pending:
+                page, task = pending.popleft()
+                if task.done():
+                    # Awaiting a prefetched page does not suspend; yield to the loop so that
+                    # consumers processing many prefetched pages don't starve other tasks
+                    await asyncio.sleep(0)
+                response_data = await task
+                page_data = response_data.get(data_key) if response_data else None
+                if not page_data:
+                    break
                 
-                if "errors" in response_data:
-                    self.logger.error(f"GraphQL errors: {response_data['errors']}")
-                    return None
+                # Handle different response structures
+                if isinstance(page_data, dict):
+                    if 'media' in page_data or 'characters' in page_data:
+                        # AniList Page structure, yield the whole page
+                        page_info = page_data.get('pageInfo')
+                        if page_info is None and isinstance(page_data.get('characters'), dict):
+                            # Media (id) { characters (page: ...) }: the connection has its own pageInfo
+                            page_info = page_data['characters'].get('pageInfo')
+                        has_next = page_info.get('hasNextPage', False) if page_info else False
+                        if page_info and page_info.get('lastPage'):
+                            last_page = min(last_page or page_info['lastPage'], page_info['lastPage'])
+                        yield page_data
+                    else:
+                        # Direct data structure
+                        has_next = False
+                        yield page_data
+                elif isinstance(page_data, list):
+                    # Direct list structure
+                    has_next = len(page_data) == page_size
+                    for item in page_data:
+                        yield item
+                else:
+                    break
                 
-                return response_data.get("data")
+                if not has_next:
+                    break
                 
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Failed to decode JSON response: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"Failed to fetch from AniList: {e}")
-            return None
+                schedule(window)
+        finally:
+            # Pages prefetched past the end (or after the consumer stopped) are dropped
+            for _, task in pending:
+                task.cancel()
+        
+        self.logger.debug("Pagination stopped after page %d for %s", page, data_key)
+    
+    async def fetch_with_pagination(
+        self,
+        query: str,
+        variables: Dict[str, Any],
+        data_key: str,
+        page_size: int = 50,
+        max_pages: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Collect every page from iter_pages into a list"""
+        all_data = [page_data async for page_data in self.iter_pages(query, variables, data_key, page_size, max_pages)]
+        self.logger.info("Fetched %d items for %s", len(all_data), data_key)
+        return all_data
     
     async def fetch_popular_characters(self, page: int = 1, per_page: int = 50) -> Optional[Dict[str, Any]]:
         """Fetch most popular characters from AniList"""
-        query = """
-        query ($page: Int, $perPage: Int) {
-            Page (page: $page, perPage: $perPage) {
-                pageInfo {
-                    total
-                    currentPage
-                    lastPage
-                    hasNextPage
-                    perPage
-                }
-                characters (sort: FAVOURITES_DESC) {
-                    id
-                    name {
-                        full
-                        first
-                        middle
-                        last
-                        native
-                        alternative
-                        alternativeSpoiler
-                    }
-                    image {
-                        large
-                        medium
-                    }
-                    description
-                    gender
-                    age
-                    bloodType
-                    dateOfBirth {
-                        year
-                        month
-                        day
-                    }
-                    favourites
-                    isFavourite
-                    isFavouriteBlocked
-                    siteUrl
-                    modNotes
-                }
-            }
-        }
-        """
-        
         variables = {"page": page, "perPage": per_page}
-        return await self._execute_query(query, variables)
+        return await self._execute_query(POPULAR_CHARACTERS_QUERY, variables)
+    
+    async def fetch_popular_characters_columnar(
+        self, page: int = 1, per_page: int = 50
+    ) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, List[Any]]]]:
+        """Fetch a page of popular characters, returned both as raw list and as columns"""
+        data = await self.fetch_popular_characters(page, per_page)
+        if not data or "Page" not in data:
+            return None
+        characters = data["Page"]["characters"]
+        return characters, self.parse_character_columns(characters)
+    
+    async def fetch_popular_characters_batch(self, pages: List[int], per_page: int = 50) -> List[Optional[Dict[str, Any]]]:
+        """Fetch several popular-character pages in one request, one result per page"""
+        variables_list = [{"page": page, "perPage": per_page} for page in pages]
+        return await self._execute_batch(POPULAR_CHARACTERS_QUERY, variables_list)
     
     async def fetch_trending_media(self, media_type: str = "ANIME", page: int = 1, per_page: int = 50) -> Optional[Dict[str, Any]]:
         """Fetch trending anime/manga"""
-        query = """
-        query ($page: Int, $perPage: Int, $type: MediaType) {
-            Page (page: $page, perPage: $perPage) {
-                pageInfo {
-                    total
-                    currentPage
-                    lastPage
-                    hasNextPage
-                    perPage
-                }
-                media (sort: TRENDING_DESC, type: $type) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    averageScore
-                    popularity
-                    favourites
-                    trending
-                    characters (sort: FAVOURITES_DESC, perPage: 10) {
-                        edges {
-                            node {
-                                id
-                                name {
-                                    full
-                                    first
-                                    middle
-                                    last
-                                    native
-                                    alternative
-                                    alternativeSpoiler
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                description
-                                gender
-                                age
-                                bloodType
-                                dateOfBirth {
-                                    year
-                                    month
-                                    day
-                                }
-                                favourites
-                                isFavourite
-                                isFavouriteBlocked
-                                siteUrl
-                                modNotes
-                            }
-                            characterRole
-                        }
-                    }
-                }
-            }
-        }
+        variables = {"page": page, "perPage": per_page, "type": media_type}
+        return await self._execute_query(TRENDING_MEDIA_QUERY, variables)
+    
+    async def fetch_trending_media_light(self, media_type: str = "ANIME", page: int = 1, per_page: int = 50) -> Optional[Dict[str, Any]]:
+        """Fetch trending anime/manga with only the character fields needed to pick sync candidates"""
+        variables = {"page": page, "perPage": per_page, "type": media_type}
+        return await self._execute_query(TRENDING_MEDIA_LIGHT_QUERY, variables)
+    
+    async def fetch_characters_by_ids(self, character_ids: List[int]) -> List[Dict[str, Any]]:
         """
+        Fetch full records for any number of characters: 50 ids per aliased operation,
+        up to max_batch_ops operations per request, requests sent concurrently
+        """
+        chunks = [
+            {"ids": character_ids[start:start + 50], "perPage": len(character_ids[start:start + 50])}
+            for start in range(0, len(character_ids), 50)
+        ]
+        batch_ops = self.config.anilist.max_batch_ops
+        batches = await asyncio.gather(*(
+            self._execute_batch(CHARACTERS_BY_IDS_QUERY, chunks[start:start + batch_ops])
+            for start in range(0, len(chunks), batch_ops)
+        ))
         
-        variables = {"page": page, "perPage": per_page, "type": media_type}
-        return await self._execute_query(query, variables)
+        return [
+            character
+            for results in batches
+            for result in results
+            if result and result.get("Page")
+            for character in result["Page"]["characters"]
+        ]
     
-    async def fetch_character_by_id(self, character_id: int) -> Optional[Dict[str, Any]]:
-        """Fetch specific character by ID"""
-        query = """
-        query ($id: Int) {
-            Character (id: $id) {
-                id
-                name {
-                    full
-                    first
-                    middle
-                    last
-                    native
-                    alternative
-                    alternativeSpoiler
-                }
-                image {
-                    large
-                    medium
-                }
-                description
-                gender
-                age
-                bloodType
-                dateOfBirth {
-                    year
-                    month
-                    day
-                }
-                favourites
-                isFavourite
-                isFavouriteBlocked
-                siteUrl
-                modNotes
-            }
-        }
+    async def fetch_character_by_id(self, character_id: int, fields: Optional[Set[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch specific character by ID
+        Without `fields`, calls made within the same few milliseconds are coalesced into one
+        request (see _DataLoader). `fields` adds GraphQL selections beyond the stored columns,
+        for detail pages (e.g. {"media (perPage: 5) { nodes { id title { romaji } } }"})
         """
+        if not fields:
+            # Shielded: callers of the same id share the future, one cancellation must not reach the others
+            return await asyncio.shield(self._character_loader.load(character_id))
         
         variables = {"id": character_id}
-        result = await self._execute_query(query, variables)
+        result = await self._execute_query(_character_by_id_query(frozenset(fields)), variables)
         return result.get("Character") if result else None
     
+    async def _batch_load_characters(self, character_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Batch function of the character loader: one id_in page for all queued ids"""
+        return {character["id"]: character for character in await self.fetch_characters_by_ids(character_ids)}
+    
     def parse_character_data(self, character_data: Dict[str, Any]) -> AniListCharacter:
         """Convert AniList data to AniListCharacter object"""
         name = character_data.get("name", {})
@@ -308,6 +1085,101 @@ class AniListFetcher:
             mod_notes=character_data.get("modNotes"),
             last_fetched_at=datetime.utcnow()
         )
+    
+    def parse_character_batch(self, characters_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert a page of AniList characters to plain row dicts keyed by column name"""
+        now = datetime.utcnow()
+        _get = dict.get
+        rows = []
+        
+        for character_data in characters_data:
+            if "id" not in character_data:
+                continue
+            name = _get(character_data, "name") or {}
+            image = _get(character_data, "image") or {}
+            birth_date = _get(character_data, "dateOfBirth") or {}
+            
+            rows.append({
+                "id": character_data["id"],
+                "name_full": _get(name, "full"),
+                "name_first": _get(name, "first"),
+                "name_middle": _get(name, "middle"),
+                "name_last": _get(name, "last"),
+                "name_native": _get(name, "native"),
+                "name_alternative": _get(name, "alternative") or [],
+                "name_alternative_spoiler": _get(name, "alternativeSpoiler") or [],
+                "image_large": _get(image, "large"),
+                "image_medium": _get(image, "medium"),
+                "description": _get(character_data, "description"),
+                "gender": _get(character_data, "gender"),
+                "age": _get(character_data, "age"),
+                "blood_type": _get(character_data, "bloodType"),
+                "birth_year": _get(birth_date, "year"),
+                "birth_month": _get(birth_date, "month"),
+                "birth_day": _get(birth_date, "day"),
+                "favourites": _get(character_data, "favourites", 0),
+                "is_favourite": _get(character_data, "isFavourite", False),
+                "is_favourite_blocked": _get(character_data, "isFavouriteBlocked", False),
+                "site_url": _get(character_data, "siteUrl"),
+                "mod_notes": _get(character_data, "modNotes"),
+                "last_fetched_at": now,
+            })
+        
+        return rows
+    
+    def parse_character_columns(
+        self,
+        characters_data: List[Dict[str, Any]],
+        columns: Optional[Dict[str, List[Any]]] = None
+    ) -> Dict[str, List[Any]]:
+        """
+        Same fields as parse_character_batch laid out column by column (one list per column)
+        Pass `columns` back in to append further pages; feeds bulk_upsert_character_columns
+        """
+        if columns is None:
+            columns = {column: [] for column in (
+                "id", "name_full", "name_first", "name_middle", "name_last", "name_native",
+                "name_alternative", "name_alternative_spoiler", "image_large", "image_medium",
+                "description", "gender", "age", "blood_type", "birth_year", "birth_month", "birth_day",
+                "favourites", "is_favourite", "is_favourite_blocked", "site_url", "mod_notes",
+                "last_fetched_at",
+            )}
+        append = {column: values.append for column, values in columns.items()}
+        now = datetime.utcnow()
+        _get = dict.get
+        
+        for character_data in characters_data:
+            if "id" not in character_data:
+                continue
+            name = _get(character_data, "name") or {}
+            image = _get(character_data, "image") or {}
+            birth_date = _get(character_data, "dateOfBirth") or {}
+            
+            append["id"](character_data["id"])
+            append["name_full"](_get(name, "full"))
+            append["name_first"](_get(name, "first"))
+            append["name_middle"](_get(name, "middle"))
+            append["name_last"](_get(name, "last"))
+            append["name_native"](_get(name, "native"))
+            append["name_alternative"](_get(name, "alternative") or [])
+            append["name_alternative_spoiler"](_get(name, "alternativeSpoiler") or [])
+            append["image_large"](_get(image, "large"))
+            append["image_medium"](_get(image, "medium"))
+            append["description"](_get(character_data, "description"))
+            append["gender"](_get(character_data, "gender"))
+            append["age"](_get(character_data, "age"))
+            append["blood_type"](_get(character_data, "bloodType"))
+            append["birth_year"](_get(birth_date, "year"))
+            append["birth_month"](_get(birth_date, "month"))
+            append["birth_day"](_get(birth_date, "day"))
+            append["favourites"](_get(character_data, "favourites", 0))
+            append["is_favourite"](_get(character_data, "isFavourite", False))
+            append["is_favourite_blocked"](_get(character_data, "isFavouriteBlocked", False))
+            append["site_url"](_get(character_data, "siteUrl"))
+            append["mod_notes"](_get(character_data, "modNotes"))
+            append["last_fetched_at"](now)
+        
+        return columns
 
 
 class AniListSyncService:
@@ -318,45 +1190,57 @@ class AniListSyncService:
         self.repository = repository
         self.logger = logging.getLogger(__name__)
     
-    async def sync_popular_characters(self, max_pages: int = 5) -> Dict[str, int]:
-        """Sync most popular characters"""
+    async def sync_popular_characters(self, max_pages: int = 5, concurrency: int = 3) -> Dict[str, int]:
+        """
+        Sync most popular characters: each round sends `concurrency` requests at once,
+        each carrying up to max_batch_ops pages as aliased operations
+        """
         results = {"synced": 0, "errors": 0, "skipped": 0}
         
-        self.logger.info(f"Starting sync of popular characters (max {max_pages} pages)")
+        self.logger.info(f"Starting sync of popular characters (max {max_pages} pages, concurrency {concurrency})")
         
-        for page in range(1, max_pages + 1):
-            try:
-                self.logger.info(f"Syncing popular characters page {page}")
-                
-                data = await self.fetcher.fetch_popular_characters(page=page, per_page=50)
-                if not data or "Page" not in data:
-                    self.logger.warning(f"No data for page {page}")
+        batch_ops = self.fetcher.config.anilist.max_batch_ops
+        page = 1
+        has_next = True
+        while has_next and page <= max_pages:
+            batch = range(page, min(page + concurrency * batch_ops, max_pages + 1))
+            page = batch.stop
+            groups = [list(batch[start:start + batch_ops]) for start in range(0, len(batch), batch_ops)]
+            
+            # Pacing is left to the token bucket in _wait_for_rate_limit
+            grouped = await asyncio.gather(
+                *(self.fetcher.fetch_popular_characters_batch(group, per_page=50) for group in groups),
+                return_exceptions=True
+            )
+            responses = []
+            for group, group_responses in zip(groups, grouped):
+                responses.extend(
+                    [group_responses] * len(group) if isinstance(group_responses, Exception) else group_responses
+                )
+            
+            columns = self.fetcher.parse_character_columns([])
+            for p, data in zip(batch, responses):
+                if isinstance(data, Exception) or not data or "Page" not in data:
+                    self.logger.warning(f"No data for page {p}")
+                    results["errors"] += 1
                     continue
                 
                 characters = data["Page"]["characters"]
-                self.logger.info(f"Processing {len(characters)} characters from page {page}")
+                self.logger.debug("Processing %d characters from page %d", len(characters), p)
                 
-                for char_data in characters:
-                    try:
-                        character = self.fetcher.parse_character_data(char_data)
-                        
-                        # Upsert in database
-                        if self.repository.upsert_character(character):
-                            results["synced"] += 1
-                            if results["synced"] % 10 == 0:
-                                self.logger.info(f"Synced {results['synced']} characters so far...")
-                        else:
-                            results["skipped"] += 1
-                            
-                    except Exception as e:
-                        self.logger.error(f"Error processing character {char_data.get('id', 'unknown')}: {e}")
-                        results["errors"] += 1
-                
-                # Rate limiting between pages
-                await asyncio.sleep(1)
+                parsed = len(columns["id"])
+                self.fetcher.parse_character_columns(characters, columns)
+                results["errors"] += len(characters) - (len(columns["id"]) - parsed)
                 
+                if not data["Page"]["pageInfo"].get("hasNextPage", False):
+                    has_next = False
+            
+            try:
+                # One upsert (COPY for large batches) per batch of pages
+                results["synced"] += await self.repository.bulk_upsert_character_columns(columns)
+                self.logger.info("Synced %d characters so far...", results["synced"])
             except Exception as e:
-                self.logger.error(f"Error syncing page {page}: {e}")
+                self.logger.error(f"Error syncing pages {batch.start}-{batch.stop - 1}: {e}")
                 results["errors"] += 1
         
         self.logger.info(f"Sync completed: {results}")
@@ -372,11 +1256,11 @@ class AniListSyncService:
                 self.logger.warning(f"No data found for character {character_id}")
                 return False
             
-            character = self.fetcher.parse_character_data(char_data)
-            success = self.repository.upsert_character(character)
+            rows = self.fetcher.parse_character_batch([char_data])
+            success = await self.repository.bulk_upsert_characters(rows) > 0
             
             if success:
-                self.logger.info(f"Successfully synced character {character_id}: {character.name_full}")
+                self.logger.info(f"Successfully synced character {character_id}: {rows[0]['name_full']}")
             else:
                 self.logger.warning(f"Failed to sync character {character_id}")
             
@@ -386,40 +1270,35 @@ class AniListSyncService:
             self.logger.error(f"Error syncing character {character_id}: {e}")
             return False
     
-    async def sync_trending_characters(self, max_pages: int = 3) -> Dict[str, int]:
-        """Sync characters from trending media"""
+    async def sync_trending_characters(self, max_pages: int = 3, max_age_hours: int = 168) -> Dict[str, int]:
+        """Sync characters from trending media, fetching full records only for new or stale ones"""
         results = {"synced": 0, "errors": 0, "skipped": 0}
         
         self.logger.info(f"Starting sync of trending characters (max {max_pages} pages)")
         
-        for page in range(1, max_pages + 1):
+        page = 0
+        async for page_data in self.fetcher.iter_pages(
+            TRENDING_MEDIA_LIGHT_QUERY, {"type": "ANIME"}, "Page", page_size=25, max_pages=max_pages
+        ):
+            page += 1
             try:
-                self.logger.info(f"Syncing trending media page {page}")
+                candidate_ids = list(dict.fromkeys(
+                    edge["node"]["id"]
+                    for media in page_data["media"]
+                    if media.get("characters")
+                    for edge in media["characters"]["edges"]
+                ))
                 
-                data = await self.fetcher.fetch_trending_media(page=page, per_page=25)
-                if not data or "Page" not in data:
-                    self.logger.warning(f"No trending data for page {page}")
-                    continue
+                # Characters fetched recently are skipped, the rest get a full record
+                fresh_ids = await self.repository.get_existing_ids(candidate_ids, max_age_hours=max_age_hours)
+                stale_ids = [char_id for char_id in candidate_ids if char_id not in fresh_ids]
+                results["skipped"] += len(fresh_ids)
                 
-                media_list = data["Page"]["media"]
-                
-                for media in media_list:
-                    if "characters" not in media or not media["characters"]["edges"]:
-                        continue
-                    
-                    for char_edge in media["characters"]["edges"]:
-                        char_data = char_edge["node"]
-                        try:
-                            character = self.fetcher.parse_character_data(char_data)
-                            
-                            if self.repository.upsert_character(character):
-                                results["synced"] += 1
-                            else:
-                                results["skipped"] += 1
-                                
-                        except Exception as e:
-                            self.logger.error(f"Error processing trending character {char_data.get('id', 'unknown')}: {e}")
-                            results["errors"] += 1
+                if stale_ids:
+                    characters = await self.fetcher.fetch_characters_by_ids(stale_ids)
+                    rows = self.fetcher.parse_character_batch(characters)
+                    results["errors"] += len(stale_ids) - len(rows)
+                    results["synced"] += await self.repository.bulk_upsert_characters(rows)
                 
                 # Rate limiting between pages
                 await asyncio.sleep(2)
@@ -430,71 +1309,3 @@ class AniListSyncService:
         
         self.logger.info(f"Trending sync completed: {results}")
         return results
-
-    async def fetch_with_pagination(
-        self, 
-        query: str, 
-        variables: Dict[str, Any],
-        data_key: str,
-        page_size: int = 50,
-        max_pages: Optional[int] = None
-    ) -> List[Dict[str, Any]]:
-        """Fetch data with automatic pagination"""
-        all_data = []
-        page = 1
-        
-        while True:
-            if max_pages and page > max_pages:
-                break
-                
-            current_variables = {
-                **variables,
-                'page': page,
-                'perPage': page_size
-            }
-            
-            try:
-                response_data = await self.fetch_data(current_variables, query)
-                
-                if not response_data or data_key not in response_data:
-                    break
-                
-                page_data = response_data[data_key]
-                if not page_data:
-                    break
-                
-                # Handle different response structures
-                if isinstance(page_data, dict):
-                    # Structure like { data: [...], pageInfo: {...} }
-                    if 'media' in page_data or 'characters' in page_data:
-                        # AniList Page structure
-                        items = page_data.get('media', []) or page_data.get('characters', [])
-                        has_next = page_data.get('pageInfo', {}).get('hasNextPage', False)
-                        all_data.append(page_data)  # Return the whole page data
-                    else:
-                        # Direct data structure
-                        items = [page_data] if page_data else []
-                        has_next = False
-                        all_data.extend(items)
-                elif isinstance(page_data, list):
-                    # Direct list structure
-                    items = page_data
-                    has_next = len(items) == page_size
-                    all_data.extend(items)
-                else:
-                    break
-                
-                if not has_next or len(items) < page_size:
-                    break
-                
-                page += 1
-                
-                # Small delay between requests to be respectful
-                await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                self.logger.error(f"Error fetching page {page}: {e}")
-                break
-        
-        self.logger.info(f"Fetched {len(all_data)} items across {page} pages")
-        return all_data
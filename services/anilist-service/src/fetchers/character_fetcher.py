@@ -1,75 +1,278 @@
 """
 Specialized fetcher for character data from AniList
 """
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from contextlib import aclosing
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
-from .anilist_fetcher import AniListFetcher
+from .anilist_fetcher import AniListFetcher, _CHARACTER_FIELDS, _indent
 from ..models import Character, MediaType
 
 
+# Media fields read by _process_character_data (inside `node { }` of a character's media edge)
+_MEDIA_NODE_FIELDS = """
+id
+title {
+    romaji
+    english
+    native
+}
+type
+format
+averageScore
+popularity
+favourites
+trending
+coverImage {
+    large
+    medium
+}
+"""
+
+# Media appearances of a character with role and Japanese voice actors (inside `media (...) { }`)
+_CHARACTER_MEDIA_FIELDS = """
+edges {
+    role: characterRole
+    voiceActors (language: JAPANESE) {
+        id
+        name {
+            full
+        }
+    }
+    node {
+""" + _indent(_MEDIA_NODE_FIELDS, 2) + """
+    }
+}
+"""
+
+# Stored character fields plus media appearances with role and Japanese voice actors
+CHARACTER_DETAIL_QUERY = """
+query ($id: Int, $perPage: Int) {
+    Character (id: $id) {
+""" + _indent(_CHARACTER_FIELDS, 2) + """
+        media (perPage: $perPage, sort: POPULARITY_DESC) {
+""" + _indent(_CHARACTER_MEDIA_FIELDS, 3) + """
+        }
+    }
+}
+"""
+
+# Ranked listing: only what a list view shows (~5 fields per character instead of ~40)
+POPULAR_CHARACTERS_LISTING_QUERY = """
+query ($page: Int, $perPage: Int) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+        }
+        characters (sort: FAVOURITES_DESC) {
+            id
+            name {
+                full
+            }
+            image {
+                medium
+            }
+            favourites
+        }
+    }
+}
+"""
+
+# Popular characters with stored fields and their top media appearances (detailed=True)
+POPULAR_CHARACTERS_DETAIL_QUERY = """
+query ($page: Int, $perPage: Int) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+        }
+        characters (sort: FAVOURITES_DESC) {
+""" + _indent(_CHARACTER_FIELDS, 3) + """
+            media (perPage: 5, sort: POPULARITY_DESC) {
+""" + _indent(_CHARACTER_MEDIA_FIELDS, 4) + """
+            }
+        }
+    }
+}
+"""
+
+SEARCH_CHARACTERS_QUERY = """
+query ($search: String, $page: Int, $perPage: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        characters(search: $search, sort: FAVOURITES_DESC) {
+            id
+            name {
+                full
+                native
+                alternative
+            }
+            image {
+                large
+                medium
+            }
+            description
+            gender
+            age
+            favourites
+            media(perPage: 10, sort: FAVOURITES_DESC) {
+                edges {
+                    role: characterRole
+                    node {
+""" + _indent(_MEDIA_NODE_FIELDS, 6) + """
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+CHARACTERS_FROM_MEDIA_QUERY = """
+query ($id: Int, $page: Int, $perPage: Int) {
+    Media(id: $id) {
+        id
+        title {
+            romaji
+            english
+            native
+        }
+        characters(page: $page, perPage: $perPage, sort: FAVOURITES_DESC) {
+            edges {
+                role
+                voiceActors(language: JAPANESE) {
+                    id
+                    name {
+                        full
+                    }
+                }
+                node {
+                    id
+                    name {
+                        full
+                        native
+                        alternative
+                    }
+                    image {
+                        large
+                        medium
+                    }
+                    description
+                    gender
+                    age
+                    favourites
+                }
+            }
+            pageInfo {
+                hasNextPage
+                currentPage
+            }
+        }
+    }
+}
+"""
+
+
+# Fields read by _process_character_data, unpacked in one C-level call; the defaults
+# are those of the former .get() chain (nested dicts default to None, then `or {}`)
+_CHARACTER_DEFAULTS = {
+    'id': None, 'name': None, 'image': None, 'description': None, 'gender': None, 'age': None,
+    'favourites': 0, 'media': None,
+}
+_character_fields = itemgetter(*_CHARACTER_DEFAULTS)
+
+_MEDIA_DEFAULTS = {
+    'id': None, 'title': None, 'type': None, 'format': None, 'averageScore': None,
+    'popularity': 0, 'favourites': 0, 'trending': 0, 'coverImage': None,
+}
+_media_fields = itemgetter(*_MEDIA_DEFAULTS)
+
+
+def _voice_actors(voice_actors: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Reduce AniList voiceActors entries to {id, name}"""
+    if not voice_actors:  # most edges have none (null for manga)
+        return []
+    result = []
+    append = result.append
+    for va in voice_actors:
+        if va:
+            name = va.get('name')
+            append({'id': va.get('id'), 'name': name.get('full') if name else None})
+    return result
+
+
 class CharacterFetcher(AniListFetcher):
     """Fetcher for character data from AniList"""
     
     def __init__(self, config=None):
         super().__init__(config)
         self.logger = logging.getLogger(__name__)
+        # In-flight fetch_character_by_id lookups, shared by concurrent callers of the same id
+        self._character_tasks: Dict[int, asyncio.Task] = {}
+    
+    def get_popular_characters_query(self, detailed: bool = False) -> str:
+        """GraphQL query for popular characters: light listing, or stored fields plus media when detailed"""
+        return POPULAR_CHARACTERS_DETAIL_QUERY if detailed else POPULAR_CHARACTERS_LISTING_QUERY
+    
+    def get_character_query(self) -> str:
+        """GraphQL query for a character with media appearances (module constant)"""
+        return CHARACTER_DETAIL_QUERY
     
     async def fetch_popular_characters(
         self, 
         limit: int = 100, 
-        max_pages: Optional[int] = None
+        max_pages: Optional[int] = None,
+        detailed: bool = False
     ) -> List[Character]:
-        """Fetch popular characters by favourites count"""
-        query = self.get_popular_characters_query()
+        """
+        Fetch popular characters by favourites count
+        Only id, name, image and favourites unless `detailed` (description, media, voice actors)
+        """
+        query = self.get_popular_characters_query(detailed)
         variables = {
             'perPage': min(limit, 50)  # AniList max per page
         }
         
-        # Calculate max pages based on limit
-        if not max_pages:
-            max_pages = (limit + 49) // 50  # Round up division
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
-            raw_data = await self.fetch_with_pagination(
-                query=query,
-                variables=variables,
-                data_key='Page',
-                page_size=variables['perPage'],
-                max_pages=max_pages
+            characters = await self._collect_characters(
+                query, variables, 'Page', limit, max_pages, self._page_characters
             )
             
-            characters = []
-            timestamp = datetime.now()
-            
-            for page_data in raw_data:
-                if 'characters' not in page_data:
-                    continue
-                    
-                for char_item in page_data['characters']:
-                    try:
-                        character_data = await self._process_character_data(char_item, timestamp)
-                        characters.append(character_data)
-                        
-                        if len(characters) >= limit:
-                            break
-                            
-                    except Exception as e:
-                        self.logger.error(f"Error processing character {char_item.get('id', 'unknown')}: {e}")
-                        continue
-                
-                if len(characters) >= limit:
-                    break
-            
-            self.logger.info(f"Successfully fetched {len(characters)} popular characters")
-            return characters[:limit]  # Ensure we don't exceed the limit
+            self.logger.info("Successfully fetched %d popular characters", len(characters))
+            return characters
             
         except Exception as e:
-            self.logger.error(f"Error fetching popular characters: {e}")
+            self.logger.error("Error fetching popular characters: %s", e)
             raise
     
-    async def fetch_character_by_id(self, character_id: int) -> Optional[Character]:
-        """Fetch detailed information for a specific character"""
+    async def fetch_character_by_id(
+        self,
+        character_id: int,
+        timestamp: Optional[datetime] = None
+    ) -> Optional[Character]:
+        """
+        Fetch detailed information for a specific character
+        Callers processing several characters can pass one shared `timestamp`.
+        Concurrent calls for the same id share one request; completed responses
+        are then served by the fetcher's TTL cache
+        """
+        task = self._character_tasks.get(character_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_character_by_id(character_id, timestamp))
+            self._character_tasks[character_id] = task
+            task.add_done_callback(lambda _: self._character_tasks.pop(character_id, None))
+        # shield: a cancelled caller must not cancel the lookup the others are waiting on
+        return await asyncio.shield(task)
+    
+    async def _fetch_character_by_id(self, character_id: int, timestamp: Optional[datetime]) -> Optional[Character]:
+        """Single request behind fetch_character_by_id"""
         query = self.get_character_query()
         variables = {
             'id': character_id,
@@ -80,32 +283,44 @@ class CharacterFetcher(AniListFetcher):
             response = await self._make_request(query, variables)
             
             if not response or 'Character' not in response:
-                self.logger.warning(f"No character found with ID {character_id}")
+                self.logger.warning("No character found with ID %s", character_id)
                 return None
             
             char_data = response['Character']
-            timestamp = datetime.now()
-            
-            return await self._process_character_data(char_data, timestamp, detailed=True)
+            return self._process_character_data(char_data, timestamp or datetime.now(), detailed=True)
             
         except Exception as e:
-            self.logger.error(f"Error fetching character {character_id}: {e}")
+            self.logger.error("Error fetching character %s: %s", character_id, e)
             raise
     
     async def fetch_characters_by_ids(self, character_ids: List[int]) -> List[Character]:
-        """Fetch multiple characters by their IDs"""
-        characters = []
+        """
+        Fetch multiple characters by their IDs as aliased Character operations: up to
+        max_batch_ops per request (split further by the complexity budget), requests sent concurrently
+        """
+        # Overlapping ids (cross-referenced media) are requested once
+        character_ids = list(dict.fromkeys(character_ids))
+        variables_list = [{'id': char_id, 'perPage': 25} for char_id in character_ids]
+        batch_ops = self.config.anilist.max_batch_ops
+        batches = await asyncio.gather(*(
+            self._execute_batch(self.get_character_query(), variables_list[start:start + batch_ops])
+            for start in range(0, len(variables_list), batch_ops)
+        ))
+        results = [result for batch_results in batches for result in batch_results]
         
-        for char_id in character_ids:
+        characters = []
+        timestamp = datetime.now()
+        for char_id, result in zip(character_ids, results):
+            if not result or not result.get('Character'):
+                self.logger.warning("No character found with ID %s", char_id)
+                continue
             try:
-                char_data = await self.fetch_character_by_id(char_id)
-                if char_data:
-                    characters.append(char_data)
+                characters.append(self._process_character_data(result['Character'], timestamp, detailed=True))
             except Exception as e:
-                self.logger.error(f"Error fetching character {char_id}: {e}")
+                self.logger.error("Error processing character %s: %s", char_id, e)
                 continue
         
-        self.logger.info(f"Successfully fetched {len(characters)} out of {len(character_ids)} requested characters")
+        self.logger.info("Successfully fetched %d out of %d requested characters", len(characters), len(character_ids))
         return characters
     
     async def search_characters(
@@ -114,98 +329,23 @@ class CharacterFetcher(AniListFetcher):
         limit: int = 50
     ) -> List[Character]:
         """Search for characters by name"""
-        query = """
-        query ($search: String, $page: Int, $perPage: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                characters(search: $search, sort: FAVOURITES_DESC) {
-                    id
-                    name {
-                        full
-                        native
-                        alternative
-                    }
-                    image {
-                        large
-                        medium
-                    }
-                    description
-                    gender
-                    age
-                    favourites
-                    media(perPage: 10, sort: FAVOURITES_DESC) {
-                        edges {
-                            role
-                            node {
-                                id
-                                title {
-                                    romaji
-                                    english
-                                    native
-                                }
-                                type
-                                format
-                                averageScore
-                                popularity
-                                favourites
-                                trending
-                                coverImage {
-                                    large
-                                    medium
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = SEARCH_CHARACTERS_QUERY
         variables = {
             'search': search_term,
             'perPage': min(limit, 50)
         }
         
         try:
-            raw_data = await self.fetch_with_pagination(
-                query=query,
-                variables=variables,
-                data_key='Page',
-                page_size=variables['perPage'],
-                max_pages=(limit + 49) // 50
+            characters = await self._collect_characters(
+                query, variables, 'Page', limit,
+                self._pages_for(limit, variables['perPage']), self._page_characters
             )
             
-            characters = []
-            timestamp = datetime.now()
-            
-            for page_data in raw_data:
-                if 'characters' not in page_data:
-                    continue
-                    
-                for char_item in page_data['characters']:
-                    try:
-                        character_data = await self._process_character_data(char_item, timestamp)
-                        characters.append(character_data)
-                        
-                        if len(characters) >= limit:
-                            break
-                            
-                    except Exception as e:
-                        self.logger.error(f"Error processing character {char_item.get('id', 'unknown')}: {e}")
-                        continue
-                
-                if len(characters) >= limit:
-                    break
-            
-            self.logger.info(f"Successfully found {len(characters)} characters matching '{search_term}'")
-            return characters[:limit]
+            self.logger.info("Successfully found %d characters matching '%s'", len(characters), search_term)
+            return characters
             
         except Exception as e:
-            self.logger.error(f"Error searching characters for '{search_term}': {e}")
+            self.logger.error("Error searching characters for '%s': %s", search_term, e)
             raise
     
     async def fetch_characters_from_media(
@@ -214,188 +354,130 @@ class CharacterFetcher(AniListFetcher):
         limit: int = 50
     ) -> List[Character]:
         """Fetch characters from a specific anime/manga"""
-        query = """
-        query ($id: Int, $page: Int, $perPage: Int) {
-            Media(id: $id) {
-                id
-                title {
-                    romaji
-                    english
-                    native
-                }
-                characters(page: $page, perPage: $perPage, sort: FAVOURITES_DESC) {
-                    edges {
-                        role
-                        voiceActors(language: JAPANESE) {
-                            id
-                            name {
-                                full
-                            }
-                        }
-                        node {
-                            id
-                            name {
-                                full
-                                native
-                                alternative
-                            }
-                            image {
-                                large
-                                medium
-                            }
-                            description
-                            gender
-                            age
-                            favourites
-                            media(perPage: 5, sort: FAVOURITES_DESC) {
-                                edges {
-                                    role
-                                    node {
-                                        id
-                                        title {
-                                            romaji
-                                            english
-                                            native
-                                        }
-                                        type
-                                        format
-                                        averageScore
-                                        popularity
-                                        favourites
-                                        trending
-                                        coverImage {
-                                            large
-                                            medium
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                    pageInfo {
-                        hasNextPage
-                        currentPage
-                    }
-                }
-            }
-        }
-        """
-        
+        query = CHARACTERS_FROM_MEDIA_QUERY
         variables = {
             'id': media_id,
             'perPage': min(limit, 50)
         }
         
         try:
-            raw_data = await self.fetch_with_pagination(
-                query=query,
-                variables=variables,
-                data_key='Media',
-                page_size=variables['perPage'],
-                max_pages=(limit + 49) // 50
+            characters = await self._collect_characters(
+                query, variables, 'Media', limit,
+                self._pages_for(limit, variables['perPage']), self._media_characters
             )
             
-            characters = []
-            timestamp = datetime.now()
+            self.logger.info("Successfully fetched %d characters from media %s", len(characters), media_id)
+            return characters
             
-            for media_data in raw_data:
-                if 'characters' not in media_data:
-                    continue
-                    
-                for char_edge in media_data['characters'].get('edges', []):
+        except Exception as e:
+            self.logger.error("Error fetching characters from media %s: %s", media_id, e)
+            raise
+    
+    @staticmethod
+    def _page_characters(page_data: Dict[str, Any]) -> Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Character nodes of a Page { characters } response"""
+        return ((char_item, {}) for char_item in page_data.get('characters') or [])
+    
+    @staticmethod
+    def _media_characters(media_data: Dict[str, Any]) -> Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Character nodes of a Media { characters { edges } } response"""
+        edges = (media_data.get('characters') or {}).get('edges', [])
+        # Role and voice actors come from the media edge, not the node
+        return (
+            (char_edge['node'], {
+                'current_role': char_edge.get('role'),
+                'current_voice_actors': char_edge.get('voiceActors', [])
+            })
+            for char_edge in edges if char_edge.get('node')
+        )
+    
+    async def _collect_characters(
+        self,
+        query: str,
+        variables: Dict[str, Any],
+        data_key: str,
+        limit: int,
+        max_pages: Optional[int],
+        extract_items: Callable[[Dict[str, Any]], Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]]
+    ) -> List[Character]:
+        """
+        Page through a characters query until `limit` characters are processed
+        `extract_items` maps each page to (character node, extra _process_character_data kwargs) pairs
+        """
+        characters = []
+        timestamp = datetime.now()
+        
+        # Pages are processed as they arrive; leaving early cancels those still in flight
+        async with aclosing(self.iter_pages(
+            query=query,
+            variables=variables,
+            data_key=data_key,
+            page_size=variables['perPage'],
+            max_pages=max_pages
+        )) as pages:
+            async for page_data in pages:
+                for char_item, extra in extract_items(page_data):
                     try:
-                        char_node = char_edge.get('node', {})
-                        if not char_node:
-                            continue
-                        
-                        # Add role and voice actor info to character data
-                        char_node['current_role'] = char_edge.get('role')
-                        char_node['current_voice_actors'] = char_edge.get('voiceActors', [])
-                        
-                        character_data = await self._process_character_data(char_node, timestamp)
-                        characters.append(character_data)
-                        
-                        if len(characters) >= limit:
-                            break
-                            
+                        characters.append(self._process_character_data(char_item, timestamp, **extra))
                     except Exception as e:
-                        self.logger.error(f"Error processing character from media {media_id}: {e}")
+                        self.logger.error("Error processing character %s: %s", char_item.get('id', 'unknown'), e)
                         continue
-                
-                if len(characters) >= limit:
-                    break
-            
-            self.logger.info(f"Successfully fetched {len(characters)} characters from media {media_id}")
-            return characters[:limit]
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching characters from media {media_id}: {e}")
-            raise
+                    
+                    if len(characters) >= limit:
+                        return characters
+        
+        return characters
     
-    async def _process_character_data(
+    def _process_character_data(
         self, 
         char_item: Dict[str, Any], 
         timestamp: datetime,
+        current_role: Optional[str] = None,
+        current_voice_actors: Optional[List[Dict[str, Any]]] = None,
         detailed: bool = False
     ) -> Character:
         """Process raw character data into Character object"""
+        (character_id, name_data, image, description, gender, age, favourites,
+         media) = _character_fields({**_CHARACTER_DEFAULTS, **char_item})
+        name_data = name_data or {}
         
         # Process media appearances
         media_appearances = []
-        if 'media' in char_item and char_item['media']:
-            media_edges = char_item['media'].get('edges', [])
-            for media_edge in media_edges:
-                media_node = media_edge.get('node', {})
+        if media:
+            for media_edge in media.get('edges', []):
+                media_node = media_edge.get('node')
                 if media_node:
-                    media_info = {
-                        'media_id': media_node.get('id'),
-                        'title': media_node.get('title', {}),
-                        'type': media_node.get('type'),
-                        'format': media_node.get('format'),
-                        'average_score': media_node.get('averageScore'),
-                        'popularity': media_node.get('popularity', 0),
-                        'favourites': media_node.get('favourites', 0),
-                        'trending': media_node.get('trending', 0),
-                        'cover_image': media_node.get('coverImage', {}),
+                    (media_id, title, media_type, media_format, average_score,
+                     popularity, media_favourites, trending, cover_image) = _media_fields({**_MEDIA_DEFAULTS, **media_node})
+                    media_appearances.append({
+                        'media_id': media_id,
+                        'title': title or {},
+                        'type': media_type,
+                        'format': media_format,
+                        'average_score': average_score,
+                        'popularity': popularity,
+                        'favourites': media_favourites,
+                        'trending': trending,
+                        'cover_image': cover_image or {},
                         'role': media_edge.get('role'),
-                        'voice_actors': [
-                            {
-                                'id': va.get('id'),
-                                'name': va.get('name', {}).get('full')
-                            }
-                            for va in media_edge.get('voiceActors', [])
-                        ]
-                    }
-                    media_appearances.append(media_info)
-        
-        # Handle current role info if available (from media-specific queries)
-        current_role = char_item.get('current_role')
-        current_voice_actors = char_item.get('current_voice_actors', [])
-        
-        # Process alternative names
-        name_data = char_item.get('name', {})
-        alternative_names = name_data.get('alternative', []) if name_data.get('alternative') else []
+                        'voice_actors': _voice_actors(media_edge.get('voiceActors', []))
+                    })
         
         character_data = Character(
             timestamp=timestamp,
-            character_id=char_item.get('id'),
+            character_id=character_id,
             name=name_data.get('full'),
             name_native=name_data.get('native'),
-            alternative_names=alternative_names,
-            image=char_item.get('image', {}),
-            description=char_item.get('description'),
-            gender=char_item.get('gender'),
-            age=char_item.get('age'),
-            favourites=char_item.get('favourites', 0),
+            alternative_names=name_data.get('alternative') or [],
+            image=image or {},
+            description=description,
+            gender=gender,
+            age=age,
+            favourites=favourites,
             media_appearances=media_appearances,
+            # Role info from media-specific queries, if available
             current_role=current_role,
-            current_voice_actors=[
-                {
-                    'id': va.get('id'),
-                    'name': va.get('name', {}).get('full')
-                }
-                for va in current_voice_actors
-            ]
+            current_voice_actors=_voice_actors(current_voice_actors)
         )
         
         return character_data
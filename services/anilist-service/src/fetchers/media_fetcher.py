@@ -8,6 +8,662 @@ from .anilist_fetcher import AniListFetcher
 from ..models import MediaData, MediaType
 
 
+MEDIA_BY_ID_QUERY = """
+query ($id: Int) {
+    Media(id: $id) {
+        id
+        title {
+            romaji
+            english
+            native
+        }
+        type
+        format
+        status
+        description
+        startDate {
+            year
+            month
+            day
+        }
+        endDate {
+            year
+            month
+            day
+        }
+        season
+        seasonYear
+        episodes
+        duration
+        chapters
+        volumes
+        genres
+        tags {
+            name
+            rank
+            category
+        }
+        popularity
+        favourites
+        averageScore
+        meanScore
+        trending
+        coverImage {
+            large
+            medium
+            color
+        }
+        bannerImage
+        characters(sort: FAVOURITES_DESC, perPage: 25) {
+            edges {
+                role
+                voiceActors(language: JAPANESE) {
+                    id
+                    name {
+                        full
+                    }
+                }
+                node {
+                    id
+                    name {
+                        full
+                        native
+                    }
+                    image {
+                        large
+                        medium
+                    }
+                    description
+                    gender
+                    age
+                    favourites
+                }
+            }
+        }
+        studios {
+            nodes {
+                id
+                name
+                isAnimationStudio
+            }
+        }
+        relations {
+            edges {
+                relationType
+                node {
+                    id
+                    title {
+                        romaji
+                        english
+                    }
+                    type
+                    format
+                    coverImage {
+                        medium
+                    }
+                }
+            }
+        }
+        recommendations {
+            edges {
+                rating
+                node {
+                    mediaRecommendation {
+                        id
+                        title {
+                            romaji
+                            english
+                        }
+                        type
+                        format
+                        averageScore
+                        coverImage {
+                            medium
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+SEARCH_MEDIA_QUERY = """
+query ($search: String, $type: MediaType, $page: Int, $perPage: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(search: $search, type: $type, sort: POPULARITY_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            chapters
+            volumes
+            genres
+            tags {
+                name
+                rank
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        gender
+                        favourites
+                    }
+                }
+            }
+            studios {
+                nodes {
+                    id
+                    name
+                }
+            }
+        }
+    }
+}
+"""
+
+POPULAR_MEDIA_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(type: $type, sort: POPULARITY_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            endDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            chapters
+            volumes
+            genres
+            tags {
+                name
+                rank
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    role
+                    voiceActors(language: JAPANESE) {
+                        id
+                        name {
+                            full
+                        }
+                    }
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        description
+                        gender
+                        age
+                        favourites
+                    }
+                }
+            }
+            studios {
+                nodes {
+                    id
+                    name
+                }
+            }
+        }
+    }
+}
+"""
+
+TOP_RATED_MEDIA_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(type: $type, sort: SCORE_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            endDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            chapters
+            volumes
+            genres
+            tags {
+                name
+                rank
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    role
+                    voiceActors(language: JAPANESE) {
+                        id
+                        name {
+                            full
+                        }
+                    }
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        description
+                        gender
+                        age
+                        favourites
+                    }
+                }
+            }
+            studios {
+                nodes {
+                    id
+                    name
+                }
+            }
+        }
+    }
+}
+"""
+
+TRENDING_MEDIA_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(type: $type, sort: TRENDING_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            endDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            chapters
+            volumes
+            genres
+            tags {
+                name
+                rank
+                category
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+                color
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 25) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        gender
+                        favourites
+                    }
+                }
+            }
+            studios {
+                edges {
+                    node {
+                        id
+                        name
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+UPCOMING_MEDIA_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int, $year: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(type: $type, status: NOT_YET_RELEASED, seasonYear_greater: $year, sort: POPULARITY_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            genres
+            tags {
+                name
+                rank
+                category
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+                color
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 25) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        gender
+                        favourites
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+RECENTLY_RELEASED_MEDIA_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int, $year: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(type: $type, status: RELEASING, seasonYear: $year, sort: POPULARITY_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            genres
+            tags {
+                name
+                rank
+                category
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+                color
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 25) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        gender
+                        favourites
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+CURRENT_SEASON_MEDIA_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int, $season: MediaSeason, $year: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(type: $type, season: $season, seasonYear: $year, sort: POPULARITY_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            genres
+            tags {
+                name
+                rank
+                category
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+                color
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 25) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        gender
+                        favourites
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
 class MediaFetcher(AniListFetcher):
     """Fetcher for anime and manga media data"""
     
@@ -49,126 +705,7 @@ class MediaFetcher(AniListFetcher):
     
     async def fetch_media_by_id(self, media_id: int) -> Optional[MediaData]:
         """Fetch detailed information for a specific media"""
-        query = """
-        query ($id: Int) {
-            Media(id: $id) {
-                id
-                title {
-                    romaji
-                    english
-                    native
-                }
-                type
-                format
-                status
-                description
-                startDate {
-                    year
-                    month
-                    day
-                }
-                endDate {
-                    year
-                    month
-                    day
-                }
-                season
-                seasonYear
-                episodes
-                duration
-                chapters
-                volumes
-                genres
-                tags {
-                    name
-                    rank
-                    category
-                }
-                popularity
-                favourites
-                averageScore
-                meanScore
-                trending
-                coverImage {
-                    large
-                    medium
-                    color
-                }
-                bannerImage
-                characters(sort: FAVOURITES_DESC, perPage: 25) {
-                    edges {
-                        role
-                        voiceActors(language: JAPANESE) {
-                            id
-                            name {
-                                full
-                            }
-                        }
-                        node {
-                            id
-                            name {
-                                full
-                                native
-                            }
-                            image {
-                                large
-                                medium
-                            }
-                            description
-                            gender
-                            age
-                            favourites
-                        }
-                    }
-                }
-                studios {
-                    nodes {
-                        id
-                        name
-                        isAnimationStudio
-                    }
-                }
-                relations {
-                    edges {
-                        relationType
-                        node {
-                            id
-                            title {
-                                romaji
-                                english
-                            }
-                            type
-                            format
-                            coverImage {
-                                medium
-                            }
-                        }
-                    }
-                }
-                recommendations {
-                    edges {
-                        rating
-                        node {
-                            mediaRecommendation {
-                                id
-                                title {
-                                    romaji
-                                    english
-                                }
-                                type
-                                format
-                                averageScore
-                                coverImage {
-                                    medium
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = MEDIA_BY_ID_QUERY
         variables = {'id': media_id}
         
         try:
@@ -194,80 +731,7 @@ class MediaFetcher(AniListFetcher):
         limit: int = 50
     ) -> List[MediaData]:
         """Search for media by title"""
-        query = """
-        query ($search: String, $type: MediaType, $page: Int, $perPage: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(search: $search, type: $type, sort: POPULARITY_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    chapters
-                    volumes
-                    genres
-                    tags {
-                        name
-                        rank
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 10) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                gender
-                                favourites
-                            }
-                        }
-                    }
-                    studios {
-                        nodes {
-                            id
-                            name
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = SEARCH_MEDIA_QUERY
         variables = {
             'search': search_term,
             'perPage': min(limit, 50)
@@ -282,7 +746,7 @@ class MediaFetcher(AniListFetcher):
                 variables=variables,
                 data_key='Page',
                 page_size=variables['perPage'],
-                max_pages=(limit + 49) // 50
+                max_pages=self._pages_for(limit, variables['perPage'])
             )
             
             media_list = []
@@ -361,100 +825,13 @@ class MediaFetcher(AniListFetcher):
         max_pages: Optional[int]
     ) -> List[MediaData]:
         """Internal method to fetch popular media of specific type"""
-        query = """
-        query ($type: MediaType, $page: Int, $perPage: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(type: $type, sort: POPULARITY_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    endDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    chapters
-                    volumes
-                    genres
-                    tags {
-                        name
-                        rank
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 10) {
-                        edges {
-                            role
-                            voiceActors(language: JAPANESE) {
-                                id
-                                name {
-                                    full
-                                }
-                            }
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                description
-                                gender
-                                age
-                                favourites
-                            }
-                        }
-                    }
-                    studios {
-                        nodes {
-                            id
-                            name
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = POPULAR_MEDIA_QUERY
         variables = {
             'type': media_type.value,
             'perPage': min(limit, 50)
         }
         
-        if not max_pages:
-            max_pages = (limit + 49) // 50
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -501,100 +878,13 @@ class MediaFetcher(AniListFetcher):
         max_pages: Optional[int]
     ) -> List[MediaData]:
         """Internal method to fetch top rated media of specific type"""
-        query = """
-        query ($type: MediaType, $page: Int, $perPage: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(type: $type, sort: SCORE_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    endDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    chapters
-                    volumes
-                    genres
-                    tags {
-                        name
-                        rank
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 10) {
-                        edges {
-                            role
-                            voiceActors(language: JAPANESE) {
-                                id
-                                name {
-                                    full
-                                }
-                            }
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                description
-                                gender
-                                age
-                                favourites
-                            }
-                        }
-                    }
-                    studios {
-                        nodes {
-                            id
-                            name
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = TOP_RATED_MEDIA_QUERY
         variables = {
             'type': media_type.value,
             'perPage': min(limit, 50)
         }
         
-        if not max_pages:
-            max_pages = (limit + 49) // 50
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -641,96 +931,13 @@ class MediaFetcher(AniListFetcher):
         max_pages: Optional[int]
     ) -> List[MediaData]:
         """Internal method to fetch trending media of specific type"""
-        query = """
-        query ($type: MediaType, $page: Int, $perPage: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(type: $type, sort: TRENDING_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    endDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    chapters
-                    volumes
-                    genres
-                    tags {
-                        name
-                        rank
-                        category
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                        color
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 25) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                gender
-                                favourites
-                            }
-                        }
-                    }
-                    studios {
-                        edges {
-                            node {
-                                id
-                                name
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = TRENDING_MEDIA_QUERY
         variables = {
             'type': media_type.value,
             'perPage': min(limit, 50)
         }
         
-        if not max_pages:
-            max_pages = (limit + 49) // 50
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -780,82 +987,14 @@ class MediaFetcher(AniListFetcher):
         from datetime import datetime
         current_year = datetime.now().year
         
-        query = """
-        query ($type: MediaType, $page: Int, $perPage: Int, $year: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(type: $type, status: NOT_YET_RELEASED, seasonYear_greater: $year, sort: POPULARITY_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    genres
-                    tags {
-                        name
-                        rank
-                        category
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                        color
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 25) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                gender
-                                favourites
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = UPCOMING_MEDIA_QUERY
         variables = {
             'type': media_type.value,
             'year': current_year - 1,
             'perPage': min(limit, 50)
         }
         
-        if not max_pages:
-            max_pages = (limit + 49) // 50
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -905,82 +1044,14 @@ class MediaFetcher(AniListFetcher):
         from datetime import datetime
         current_year = datetime.now().year
         
-        query = """
-        query ($type: MediaType, $page: Int, $perPage: Int, $year: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(type: $type, status: RELEASING, seasonYear: $year, sort: POPULARITY_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    genres
-                    tags {
-                        name
-                        rank
-                        category
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                        color
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 25) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                gender
-                                favourites
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = RECENTLY_RELEASED_MEDIA_QUERY
         variables = {
             'type': media_type.value,
             'year': current_year,
             'perPage': min(limit, 50)
         }
         
-        if not max_pages:
-            max_pages = (limit + 49) // 50
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -1042,74 +1113,7 @@ class MediaFetcher(AniListFetcher):
         else:
             season = "FALL"
         
-        query = """
-        query ($type: MediaType, $page: Int, $perPage: Int, $season: MediaSeason, $year: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(type: $type, season: $season, seasonYear: $year, sort: POPULARITY_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    genres
-                    tags {
-                        name
-                        rank
-                        category
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                        color
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 25) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                gender
-                                favourites
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = CURRENT_SEASON_MEDIA_QUERY
         variables = {
             'type': media_type.value,
             'season': season,
@@ -1117,8 +1121,7 @@ class MediaFetcher(AniListFetcher):
             'perPage': min(limit, 50)
         }
         
-        if not max_pages:
-            max_pages = (limit + 49) // 50
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -2,12 +2,184 @@
 Specialized fetcher for trending anime/manga data from AniList
 """
 import logging
-from typing import List, Dict, Any, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
 from datetime import datetime
 from .anilist_fetcher import AniListFetcher
 from ..models import TrendingScoreData, MediaType
 
 
+# Trending media with the fields read by _fetch_trending_media (characters, studios, tags)
+TRENDING_QUERY = """
+query ($type: MediaType, $page: Int, $perPage: Int) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+        }
+        media (type: $type, sort: TRENDING_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            endDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            chapters
+            volumes
+            genres
+            tags {
+                name
+                rank
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+            }
+            bannerImage
+            characters (sort: FAVOURITES_DESC, perPage: 25) {
+                edges {
+                    role
+                    voiceActors (language: JAPANESE) {
+                        id
+                        name {
+                            full
+                        }
+                    }
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        description
+                        gender
+                        age
+                        favourites
+                    }
+                }
+            }
+            studios {
+                nodes {
+                    id
+                    name
+                }
+            }
+        }
+    }
+}
+"""
+
+SEASONAL_ANIME_QUERY = """
+query ($year: Int, $season: MediaSeason, $page: Int, $perPage: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            perPage
+        }
+        media(seasonYear: $year, season: $season, type: ANIME, sort: POPULARITY_DESC) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            description
+            startDate {
+                year
+                month
+                day
+            }
+            endDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            duration
+            genres
+            tags {
+                name
+                rank
+            }
+            popularity
+            favourites
+            averageScore
+            meanScore
+            trending
+            coverImage {
+                large
+                medium
+            }
+            bannerImage
+            characters(sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    role
+                    voiceActors(language: JAPANESE) {
+                        id
+                        name {
+                            full
+                        }
+                    }
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        description
+                        gender
+                        age
+                        favourites
+                    }
+                }
+            }
+            studios {
+                nodes {
+                    id
+                    name
+                }
+            }
+        }
+    }
+}
+"""
+
+
 class TrendingFetcher(AniListFetcher):
     """Fetcher for trending anime and manga data"""
     
@@ -15,6 +187,10 @@ class TrendingFetcher(AniListFetcher):
         super().__init__(config)
         self.logger = logging.getLogger(__name__)
     
+    def get_trending_query(self) -> str:
+        """GraphQL query for trending media (module constant)"""
+        return TRENDING_QUERY
+    
     async def fetch_trending_anime(
         self, 
         limit: int = 50, 
@@ -59,9 +235,7 @@ class TrendingFetcher(AniListFetcher):
             'perPage': min(limit, 50)  # AniList max per page
         }
         
-        # Calculate max pages based on limit
-        if not max_pages:
-            max_pages = (limit + 49) // 50  # Round up division
+        max_pages = self._pages_for(limit, variables['perPage'], max_pages)
         
         try:
             raw_data = await self.fetch_with_pagination(
@@ -81,75 +255,7 @@ class TrendingFetcher(AniListFetcher):
                     
                 for media_item in page_data['media']:
                     try:
-                        # Extract characters with their roles and details
-                        characters = []
-                        if 'characters' in media_item and media_item['characters']:
-                            for char_edge in media_item['characters'].get('edges', []):
-                                char_node = char_edge.get('node', {})
-                                if char_node:
-                                    character_data = {
-                                        'id': char_node.get('id'),
-                                        'name': char_node.get('name', {}),
-                                        'image': char_node.get('image', {}),
-                                        'description': char_node.get('description'),
-                                        'gender': char_node.get('gender'),
-                                        'age': char_node.get('age'),
-                                        'favourites': char_node.get('favourites', 0),
-                                        'role': char_edge.get('role'),
-                                        'voice_actors': []
-                                    }
-                                    
-                                    # Add voice actors
-                                    for va in char_edge.get('voiceActors', []):
-                                        character_data['voice_actors'].append({
-                                            'id': va.get('id'),
-                                            'name': va.get('name', {}).get('full')
-                                        })
-                                    
-                                    characters.append(character_data)
-                        
-                        # Extract studios
-                        studios = []
-                        if 'studios' in media_item and media_item['studios']:
-                            for studio in media_item['studios'].get('nodes', []):
-                                studios.append({
-                                    'id': studio.get('id'),
-                                    'name': studio.get('name')
-                                })
-                        
-                        # Create TrendingScoreData object
-                        trending_item = TrendingScoreData(
-                            timestamp=timestamp,
-                            media_id=media_item.get('id'),
-                            title=media_item.get('title', {}),
-                            media_type=media_type,
-                            format=media_item.get('format'),
-                            status=media_item.get('status'),
-                            description=media_item.get('description'),
-                            start_date=media_item.get('startDate'),
-                            end_date=media_item.get('endDate'),
-                            season=media_item.get('season'),
-                            season_year=media_item.get('seasonYear'),
-                            episodes=media_item.get('episodes'),
-                            duration=media_item.get('duration'),
-                            chapters=media_item.get('chapters'),
-                            volumes=media_item.get('volumes'),
-                            genres=media_item.get('genres', []),
-                            tags=[
-                                {'name': tag.get('name'), 'rank': tag.get('rank')} 
-                                for tag in media_item.get('tags', [])
-                            ],
-                            popularity=media_item.get('popularity', 0),
-                            favourites=media_item.get('favourites', 0),
-                            average_score=media_item.get('averageScore'),
-                            mean_score=media_item.get('meanScore'),
-                            trending_rank=media_item.get('trending', 0),
-                            cover_image=media_item.get('coverImage', {}),
-                            banner_image=media_item.get('bannerImage'),
-                            characters=characters,
-                            studios=studios
-                        )
-                        
+                        trending_item = self._parse_trending_item(media_item, media_type, timestamp)
                         trending_data.append(trending_item)
                         
                         if len(trending_data) >= limit:
@@ -169,6 +275,113 @@ class TrendingFetcher(AniListFetcher):
             self.logger.error(f"Error fetching trending {media_type.value.lower()}: {e}")
             raise
     
+    async def stream_trending(
+        self,
+        media_type: MediaType = MediaType.ANIME,
+        limit: int = 50,
+        max_pages: Optional[int] = None
+    ) -> AsyncIterator[TrendingScoreData]:
+        """
+        Stream trending media one item at a time (incremental JSON parse via stream_items)
+        Pages with 25 characters and voice actors per media are large; this keeps only
+        the current media item in memory instead of the whole page
+        """
+        per_page = min(limit, 50)
+        max_pages = self._pages_for(limit, per_page, max_pages)
+        
+        timestamp = datetime.now()
+        count = 0
+        for page in range(1, max_pages + 1):
+            variables = {'type': media_type.value, 'page': page, 'perPage': per_page}
+            page_count = 0
+            # Leaving early closes the stream: its in_flight slot and HTTP response are released now
+            async with aclosing(self.stream_items(self.get_trending_query(), variables, 'data.Page.media.item')) as items:
+                async for media_item in items:
+                    page_count += 1
+                    try:
+                        yield self._parse_trending_item(media_item, media_type, timestamp)
+                    except Exception as e:
+                        self.logger.error(f"Error processing media item {media_item.get('id', 'unknown')}: {e}")
+                        continue
+                    
+                    count += 1
+                    if count >= limit:
+                        return
+            
+            # A short page is the last one (pageInfo comes before media and is not tracked here)
+            if page_count < per_page:
+                return
+    
+    def _parse_trending_item(self, media_item: Dict[str, Any], media_type: MediaType, timestamp: datetime) -> TrendingScoreData:
+        """Build TrendingScoreData from a raw media item"""
+        # Extract characters with their roles and details
+        characters = []
+        if 'characters' in media_item and media_item['characters']:
+            for char_edge in media_item['characters'].get('edges', []):
+                char_node = char_edge.get('node', {})
+                if char_node:
+                    character_data = {
+                        'id': char_node.get('id'),
+                        'name': char_node.get('name', {}),
+                        'image': char_node.get('image', {}),
+                        'description': char_node.get('description'),
+                        'gender': char_node.get('gender'),
+                        'age': char_node.get('age'),
+                        'favourites': char_node.get('favourites', 0),
+                        'role': char_edge.get('role'),
+                        'voice_actors': []
+                    }
+        
+                    # Add voice actors
+                    for va in char_edge.get('voiceActors', []):
+                        character_data['voice_actors'].append({
+                            'id': va.get('id'),
+                            'name': va.get('name', {}).get('full')
+                        })
+        
+                    characters.append(character_data)
+        
+        # Extract studios
+        studios = []
+        if 'studios' in media_item and media_item['studios']:
+            for studio in media_item['studios'].get('nodes', []):
+                studios.append({
+                    'id': studio.get('id'),
+                    'name': studio.get('name')
+                })
+        
+        return TrendingScoreData(
+            timestamp=timestamp,
+            media_id=media_item.get('id'),
+            title=media_item.get('title', {}),
+            media_type=media_type,
+            format=media_item.get('format'),
+            status=media_item.get('status'),
+            description=media_item.get('description'),
+            start_date=media_item.get('startDate'),
+            end_date=media_item.get('endDate'),
+            season=media_item.get('season'),
+            season_year=media_item.get('seasonYear'),
+            episodes=media_item.get('episodes'),
+            duration=media_item.get('duration'),
+            chapters=media_item.get('chapters'),
+            volumes=media_item.get('volumes'),
+            genres=media_item.get('genres', []),
+            tags=[
+                {'name': tag.get('name'), 'rank': tag.get('rank')} 
+                for tag in media_item.get('tags', [])
+            ],
+            popularity=media_item.get('popularity', 0),
+            favourites=media_item.get('favourites', 0),
+            average_score=media_item.get('averageScore'),
+            mean_score=media_item.get('meanScore'),
+            trending_rank=media_item.get('trending', 0),
+            cover_image=media_item.get('coverImage', {}),
+            banner_image=media_item.get('bannerImage'),
+            characters=characters,
+            studios=studios
+        )
+    
     async def fetch_seasonal_anime(
         self,
         year: int,
@@ -176,91 +389,7 @@ class TrendingFetcher(AniListFetcher):
         limit: int = 50
     ) -> List[TrendingScoreData]:
         """Fetch anime from specific season"""
-        query = """
-        query ($year: Int, $season: MediaSeason, $page: Int, $perPage: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    perPage
-                }
-                media(seasonYear: $year, season: $season, type: ANIME, sort: POPULARITY_DESC) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    description
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    endDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    duration
-                    genres
-                    tags {
-                        name
-                        rank
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    meanScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                    }
-                    bannerImage
-                    characters(sort: FAVOURITES_DESC, perPage: 10) {
-                        edges {
-                            role
-                            voiceActors(language: JAPANESE) {
-                                id
-                                name {
-                                    full
-                                }
-                            }
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                description
-                                gender
-                                age
-                                favourites
-                            }
-                        }
-                    }
-                    studios {
-                        nodes {
-                            id
-                            name
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = SEASONAL_ANIME_QUERY
         variables = {
             'year': year,
             'season': season.upper(),
@@ -273,7 +402,7 @@ class TrendingFetcher(AniListFetcher):
                 variables=variables,
                 data_key='Page',
                 page_size=variables['perPage'],
-                max_pages=(limit + 49) // 50
+                max_pages=self._pages_for(limit, variables['perPage'])
             )
             
             seasonal_data = []
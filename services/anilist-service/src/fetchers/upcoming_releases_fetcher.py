@@ -8,6 +8,146 @@ from .anilist_fetcher import AniListFetcher
 from ..models import MediaData, MediaType
 
 
+RECENTLY_RELEASED_QUERY = """
+query ($page: Int, $perPage: Int, $startDateGreater: FuzzyDate, $startDateLesser: FuzzyDate) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+            lastPage
+        }
+        media(
+            type: ANIME,
+            status: RELEASING,
+            startDate_greater: $startDateGreater,
+            startDate_lesser: $startDateLesser,
+            sort: POPULARITY_DESC
+        ) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            startDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            genres
+            popularity
+            favourites
+            averageScore
+            trending
+            coverImage {
+                large
+                medium
+                color
+            }
+            characters(sort: FAVOURITES_DESC, perPage: 10) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        favourites
+                        gender
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+UPCOMING_BY_SEASON_QUERY = """
+query ($page: Int, $perPage: Int, $season: MediaSeason, $seasonYear: Int) {
+    Page(page: $page, perPage: $perPage) {
+        pageInfo {
+            hasNextPage
+            currentPage
+        }
+        media(
+            type: ANIME,
+            season: $season,
+            seasonYear: $seasonYear,
+            status_in: [NOT_YET_RELEASED, RELEASING],
+            sort: POPULARITY_DESC
+        ) {
+            id
+            title {
+                romaji
+                english
+                native
+            }
+            type
+            format
+            status
+            startDate {
+                year
+                month
+                day
+            }
+            season
+            seasonYear
+            episodes
+            genres
+            tags {
+                name
+                rank
+            }
+            popularity
+            favourites
+            averageScore
+            trending
+            coverImage {
+                large
+                medium
+                color
+            }
+            characters(sort: FAVOURITES_DESC, perPage: 15) {
+                edges {
+                    role
+                    node {
+                        id
+                        name {
+                            full
+                            native
+                        }
+                        image {
+                            large
+                            medium
+                        }
+                        favourites
+                        gender
+                    }
+                }
+            }
+            studios {
+                nodes {
+                    name
+                    isAnimationStudio
+                }
+            }
+        }
+    }
+}
+"""
+
+
 class UpcomingReleasesFetcher(AniListFetcher):
     """Fetcher for upcoming anime releases"""
     
@@ -58,71 +198,7 @@ class UpcomingReleasesFetcher(AniListFetcher):
         end_date = datetime.now()
         start_date = end_date - timedelta(weeks=weeks_back)
         
-        query = """
-        query ($page: Int, $perPage: Int, $startDateGreater: FuzzyDate, $startDateLesser: FuzzyDate) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                    lastPage
-                }
-                media(
-                    type: ANIME,
-                    status: RELEASING,
-                    startDate_greater: $startDateGreater,
-                    startDate_lesser: $startDateLesser,
-                    sort: POPULARITY_DESC
-                ) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    genres
-                    popularity
-                    favourites
-                    averageScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                        color
-                    }
-                    characters(sort: FAVOURITES_DESC, perPage: 10) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                favourites
-                                gender
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = RECENTLY_RELEASED_QUERY
         variables = {
             'page': 1,
             'perPage': limit,
@@ -168,80 +244,7 @@ class UpcomingReleasesFetcher(AniListFetcher):
         limit: int
     ) -> List[MediaData]:
         """Fetch upcoming anime for a specific season"""
-        query = """
-        query ($page: Int, $perPage: Int, $season: MediaSeason, $seasonYear: Int) {
-            Page(page: $page, perPage: $perPage) {
-                pageInfo {
-                    hasNextPage
-                    currentPage
-                }
-                media(
-                    type: ANIME,
-                    season: $season,
-                    seasonYear: $seasonYear,
-                    status_in: [NOT_YET_RELEASED, RELEASING],
-                    sort: POPULARITY_DESC
-                ) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    type
-                    format
-                    status
-                    startDate {
-                        year
-                        month
-                        day
-                    }
-                    season
-                    seasonYear
-                    episodes
-                    genres
-                    tags {
-                        name
-                        rank
-                    }
-                    popularity
-                    favourites
-                    averageScore
-                    trending
-                    coverImage {
-                        large
-                        medium
-                        color
-                    }
-                    characters(sort: FAVOURITES_DESC, perPage: 15) {
-                        edges {
-                            role
-                            node {
-                                id
-                                name {
-                                    full
-                                    native
-                                }
-                                image {
-                                    large
-                                    medium
-                                }
-                                favourites
-                                gender
-                            }
-                        }
-                    }
-                    studios {
-                        nodes {
-                            name
-                            isAnimationStudio
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
+        query = UPCOMING_BY_SEASON_QUERY
         variables = {
             'page': 1,
             'perPage': limit,
@@ -208,6 +208,9 @@ class AniListConfig(BaseModel):
     # API Settings
     api_url: str = "https://graphql.anilist.co"
     rate_limit_per_minute: int = 90
+    rate_limit_burst: int = 10  # Richieste consecutive ammesse prima di distribuirle nel minuto
+    max_retries: int = 5              # Tentativi per richiesta su 429/5xx/errori di connessione
+    retry_backoff_cap: float = 60.0   # Tetto in secondi del backoff esponenziale
     request_timeout: int = 30
     
     # Database
@@ -229,6 +232,12 @@ class AniListConfig(BaseModel):
     # Processing
     batch_size: int = 25
     max_concurrent_requests: int = 5
+    max_batch_ops: int = 3  # Operazioni GraphQL per richiesta (limite di complessità AniList)
+    complexity_budget: int = 5000  # Costo stimato massimo di un batch (_estimate_complexity, ~3 pagine da 50)
+    persisted_queries: bool = False  # APQ: invia solo lo sha256 delle query statiche (se il server lo supporta)
+    http2: bool = False  # Trasporto httpx HTTP/2 (richiede httpx[http2]): richieste multiplexate su una connessione
+    cache_max: int = 256          # Risposte tenute nella cache LRU del fetcher (0 = disattivata)
+    cache_ttl_seconds: int = 300  # Validità di una risposta in cache
     
     # Scheduling
     sync_schedule: str = "0 6 * * *"  # Daily at 6 AM UTC
@@ -243,6 +252,8 @@ class DatabaseConfig(BaseModel):
     pool_size: int = 10
     max_overflow: int = 20
     pool_timeout: int = 30
+    statement_timeout_ms: int = 60000  # Query più lente vengono annullate lato server
+    keepalives_idle: int = 60          # Secondi di inattività prima del primo TCP keepalive
 
 
 class ServiceConfig(BaseModel):
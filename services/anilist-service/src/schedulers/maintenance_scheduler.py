@@ -0,0 +1,118 @@
+"""
+Scheduler dei job periodici di manutenzione del database AniList
+Loop asyncio che esegue ogni job al suo intervallo; i job sync (engine SQLAlchemy)
+girano in un thread per non bloccare il loop.
+Avvio: python -m src.schedulers.maintenance_scheduler
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from ..database.database_manager import DatabaseManager
+from ..database.repositories.series_lifecycle_repository import SeriesLifecycleRepository
+from ..database.schema import create_partitioned_tables, refresh_materialized_views
+
+logger = logging.getLogger(__name__)
+
+# Intervalli dei job (secondi)
+PARTITIONS_INTERVAL_SECONDS = 24 * 3600
+MATERIALIZED_VIEWS_INTERVAL_SECONDS = 15 * 60
+CHARACTER_STATS_INTERVAL_SECONDS = 15 * 60
+
+# Ogni quanto il loop controlla i job in scadenza
+TICK_SECONDS = 60
+
+
+@dataclass
+class MaintenanceJob:
+    """Job periodico: `run` è una coroutine senza argomenti"""
+    name: str
+    interval_seconds: float
+    run: Callable[[], Awaitable[None]]
+    next_run: float = 0.0  # time.monotonic(); 0 = al primo giro del loop
+
+
+class MaintenanceScheduler:
+    """Esegue i job di manutenzione (partizioni mensili, viste materializzate, statistiche personaggi) a intervalli fissi"""
+
+    def __init__(self, db_manager: DatabaseManager,
+                 lifecycle_repository: Optional[SeriesLifecycleRepository] = None):
+        self.db_manager = db_manager
+        self.lifecycle_repository = lifecycle_repository
+        self.running = False
+        self.jobs: List[MaintenanceJob] = [
+            # Partizioni dei mesi successivi prima che le righe finiscano nella DEFAULT
+            MaintenanceJob('partitions', PARTITIONS_INTERVAL_SECONDS, self._create_partitions),
+            # mv_character_favourites_growth (crescita favourites 24h / 7d / 30d)
+            MaintenanceJob('materialized_views', MATERIALIZED_VIEWS_INTERVAL_SECONDS, self._refresh_views),
+        ]
+        if lifecycle_repository is not None:
+            # Aggregati personaggi denormalizzati su anilist_media (migrations/010)
+            self.jobs.append(
+                MaintenanceJob('character_stats', CHARACTER_STATS_INTERVAL_SECONDS, self._refresh_character_stats)
+            )
+
+    async def _create_partitions(self):
+        await asyncio.to_thread(create_partitioned_tables, self.db_manager.engine)
+
+    async def _refresh_views(self):
+        await asyncio.to_thread(refresh_materialized_views, self.db_manager.engine)
+
+    async def _refresh_character_stats(self):
+        updated = await self.lifecycle_repository.refresh_character_stats()
+        logger.info("Character stats refreshed for %d series", updated)
+
+    async def run_pending(self):
+        """Esegue i job scaduti; l'errore di un job non ferma gli altri"""
+        for job in self.jobs:
+            now = time.monotonic()
+            if now < job.next_run:
+                continue
+
+            job.next_run = now + job.interval_seconds
+            try:
+                await job.run()
+                logger.info("Maintenance job %s completed in %.1fs", job.name, time.monotonic() - now)
+            except Exception as e:
+                logger.error("Maintenance job %s failed: %s", job.name, e)
+
+    async def run(self, tick_seconds: float = TICK_SECONDS):
+        """Loop principale, fino a stop()"""
+        self.running = True
+        logger.info("Maintenance scheduler started: %s", ", ".join(job.name for job in self.jobs))
+        try:
+            while self.running:
+                await self.run_pending()
+                await asyncio.sleep(tick_seconds)
+        finally:
+            self.running = False
+            logger.info("Maintenance scheduler stopped")
+
+    def stop(self):
+        """Ferma il loop al prossimo giro"""
+        self.running = False
+
+
+def _asyncpg_url(database_url: str) -> str:
+    """URL SQLAlchemy (postgresql+psycopg://...) -> URL asyncpg (postgresql://...)"""
+    scheme, sep, rest = database_url.partition('://')
+    return f"{scheme.split('+')[0]}{sep}{rest}"
+
+
+async def main(db_manager: Optional[DatabaseManager] = None):
+    """Avvia lo scheduler con la configurazione di default del servizio"""
+    db_manager = db_manager or DatabaseManager()
+    lifecycle_repository = SeriesLifecycleRepository(_asyncpg_url(db_manager._build_database_url()))
+    await lifecycle_repository.init_pool()
+    try:
+        scheduler = MaintenanceScheduler(db_manager, lifecycle_repository)
+        await scheduler.run()
+    finally:
+        await lifecycle_repository.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
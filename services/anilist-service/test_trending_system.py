@@ -66,8 +66,13 @@ if __name__ == "__main__":
             return
         
         # Test 2: Upcoming anime
-        if not await test_upcoming_anime():
-            return
+        try:
+            if not await test_upcoming_anime():
+                return
+        finally:
+            # Shared AniList HTTP session: close it before asyncio.run closes the loop
+            from fetchers.anilist_fetcher import AniListFetcher
+            await AniListFetcher.aclose()
             
         print("🎉 All tests passed!")
     
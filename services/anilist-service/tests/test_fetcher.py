@@ -0,0 +1,282 @@
+"""
+Unit tests for the AniList fetcher helpers (no network: _execute_query is replaced per test)
+"""
+import asyncio
+import sys
+from contextlib import aclosing
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Service root on the path, as in test_setup.py
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.fetchers import anilist_fetcher
+from src.fetchers.anilist_fetcher import AniListFetcher, _DataLoader, _batched_query, _estimate_complexity
+
+
+PAGE_QUERY = """
+query ($page: Int, $perPage: Int) {
+    Page (page: $page, perPage: $perPage) {
+        pageInfo { hasNextPage }
+        characters { id name { full } }
+    }
+}
+"""
+
+
+def make_fetcher(**overrides) -> AniListFetcher:
+    settings = dict(
+        rate_limit_per_minute=60,
+        rate_limit_burst=10,
+        max_concurrent_requests=3,
+        persisted_queries=False,
+        cache_ttl_seconds=0,
+        cache_max=0,
+        max_batch_ops=5,
+    )
+    settings.update(overrides)
+    return AniListFetcher(SimpleNamespace(anilist=SimpleNamespace(**settings)))
+
+
+def character_page(page: int, last_page: int) -> dict:
+    return {'Page': {'pageInfo': {'hasNextPage': page < last_page}, 'characters': [{'id': page}]}}
+
+
+# _estimate_complexity
+
+def test_estimate_complexity_multiplies_by_page_size():
+    # Page: 1 + perPage * (pageInfo 2 + characters 4)
+    assert _estimate_complexity(PAGE_QUERY, {'perPage': 10}) == 61
+
+
+def test_estimate_complexity_assumes_max_page_size_without_variables():
+    assert _estimate_complexity(PAGE_QUERY) == 301
+
+
+def test_estimate_complexity_counts_inline_fragments():
+    query = "query { Media (id: 1) { id ... on Media { title { romaji } } } }"
+    assert _estimate_complexity(query) == 4
+
+
+# _batched_query
+
+def test_batched_query_aliases_each_operation():
+    merged, root_field = _batched_query("query ($id: Int) { Character (id: $id) { id } }", 2)
+    
+    assert root_field == 'Character'
+    assert merged == (
+        "query ($id_0: Int, $id_1: Int) {\n"
+        "op0: Character (id: $id_0) { id }\n"
+        "op1: Character (id: $id_1) { id }\n"
+        "}"
+    )
+
+
+def test_batched_query_rejects_unsupported_documents():
+    with pytest.raises(ValueError):
+        _batched_query("{ Viewer { id } }", 2)
+
+
+# _DataLoader
+
+def test_data_loader_coalesces_concurrent_loads():
+    calls = []
+    
+    async def batch_load(keys):
+        calls.append(keys)
+        return {key: key * 10 for key in keys if key != 3}
+    
+    async def run():
+        loader = _DataLoader(batch_load, max_batch=25, wait_ms=1)
+        return await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(3))
+    
+    assert asyncio.run(run()) == [10, 20, 10, None]
+    assert calls == [[1, 2, 3]]
+
+
+def test_data_loader_dispatches_full_batches_immediately():
+    calls = []
+    
+    async def batch_load(keys):
+        calls.append(keys)
+        return {key: key for key in keys}
+    
+    async def run():
+        loader = _DataLoader(batch_load, max_batch=2, wait_ms=1000)
+        return await asyncio.wait_for(asyncio.gather(loader.load(1), loader.load(2)), timeout=1)
+    
+    assert asyncio.run(run()) == [1, 2]
+    assert calls == [[1, 2]]
+
+
+def test_data_loader_propagates_batch_errors():
+    async def batch_load(keys):
+        raise RuntimeError("boom")
+    
+    async def run():
+        loader = _DataLoader(batch_load, wait_ms=1)
+        return await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+    
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+# Token bucket and _drain_rate_limit
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    real_sleep = asyncio.sleep
+    
+    async def fake_sleep(seconds, *args, **kwargs):
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+        await real_sleep(0)
+    
+    monkeypatch.setattr(anilist_fetcher, 'time', clock)
+    monkeypatch.setattr(asyncio, 'sleep', fake_sleep)
+    return clock
+
+
+def test_wait_for_rate_limit_takes_tokens_without_sleeping(clock):
+    fetcher = make_fetcher(rate_limit_per_minute=60)
+    fetcher.rate_limit_state.last_refill = clock.now
+    
+    async def run():
+        for _ in range(3):
+            await fetcher._wait_for_rate_limit()
+    
+    asyncio.run(run())
+    assert clock.sleeps == []
+    assert fetcher.rate_limit_state.tokens == 57
+
+
+def test_wait_for_rate_limit_sleeps_until_refill(clock):
+    fetcher = make_fetcher(rate_limit_per_minute=60)  # 1 token per second
+    state = fetcher.rate_limit_state
+    state.tokens, state.last_refill = 0.5, clock.now
+    
+    asyncio.run(fetcher._wait_for_rate_limit())
+    assert clock.sleeps == [0.5]
+    assert fetcher.stats['rate_limit_waits'] == 1
+
+
+def test_drain_rate_limit_makes_callers_wait_out_retry_after(clock):
+    fetcher = make_fetcher(rate_limit_per_minute=60)
+    fetcher._drain_rate_limit(retry_after=5)
+    assert fetcher.rate_limit_state.tokens == -4
+    
+    asyncio.run(fetcher._wait_for_rate_limit())
+    assert clock.sleeps == [5.0]
+
+
+# iter_pages
+
+def test_iter_pages_yields_in_page_order():
+    fetcher = make_fetcher(max_concurrent_requests=3)
+    
+    async def execute_query(query, variables):
+        page = variables['page']
+        # Later pages complete first
+        await asyncio.sleep(0.01 * (5 - page))
+        return character_page(page, last_page=4)
+    
+    fetcher._execute_query = execute_query
+    
+    async def run():
+        return [page['characters'][0]['id'] async for page in fetcher.iter_pages(PAGE_QUERY, {}, 'Page', page_size=1)]
+    
+    assert asyncio.run(run()) == [1, 2, 3, 4]
+
+
+def test_iter_pages_stops_at_max_pages():
+    fetcher = make_fetcher()
+    requested = []
+    
+    async def execute_query(query, variables):
+        requested.append(variables['page'])
+        return character_page(variables['page'], last_page=10)
+    
+    fetcher._execute_query = execute_query
+    
+    async def run():
+        return [page async for page in fetcher.iter_pages(PAGE_QUERY, {}, 'Page', page_size=1, max_pages=2)]
+    
+    assert len(asyncio.run(run())) == 2
+    assert requested == [1, 2]
+
+
+def test_iter_pages_cancels_prefetched_pages_when_closed():
+    fetcher = make_fetcher(max_concurrent_requests=3)
+    cancelled = []
+    
+    async def execute_query(query, variables):
+        page = variables['page']
+        if page <= 2:
+            return character_page(page, last_page=10)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(page)
+            raise
+    
+    fetcher._execute_query = execute_query
+    
+    async def run():
+        async with aclosing(fetcher.iter_pages(PAGE_QUERY, {}, 'Page', page_size=1)) as pages:
+            async for page in pages:
+                # Pages 2-4 are in flight once page 1 has been consumed
+                if page['characters'][0]['id'] == 2:
+                    break
+        # Let the cancelled tasks run their handlers
+        await asyncio.sleep(0)
+    
+    asyncio.run(run())
+    assert sorted(cancelled) == [3, 4]
+
+
+# parse_character_columns
+
+def test_parse_character_columns_lays_out_one_list_per_column():
+    fetcher = make_fetcher()
+    columns = fetcher.parse_character_columns([
+        {
+            'id': 1,
+            'name': {'full': 'Rem', 'native': 'レム'},
+            'image': {'large': 'large.png'},
+            'dateOfBirth': {'month': 2, 'day': 2},
+            'favourites': 100,
+        },
+        {'name': {'full': 'No id'}},  # skipped
+        {'id': 2},
+    ])
+    
+    assert columns['id'] == [1, 2]
+    assert columns['name_full'] == ['Rem', None]
+    assert columns['name_native'] == ['レム', None]
+    assert columns['name_alternative'] == [[], []]
+    assert columns['image_large'] == ['large.png', None]
+    assert columns['birth_month'] == [2, None]
+    assert columns['favourites'] == [100, 0]
+    assert columns['is_favourite'] == [False, False]
+    assert all(len(values) == 2 for values in columns.values())
+
+
+def test_parse_character_columns_appends_further_pages():
+    fetcher = make_fetcher()
+    columns = fetcher.parse_character_columns([{'id': 1}])
+    same = fetcher.parse_character_columns([{'id': 2}, {'id': 3}], columns)
+    
+    assert same is columns
+    assert columns['id'] == [1, 2, 3]
@@ -0,0 +1,39 @@
+"""
+Test degli helper di schema.py
+"""
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Radice del servizio nel path, come in test_setup.py
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.database.schema import uuid7
+
+
+def test_uuid7_version_and_variant():
+    value = uuid7()
+    
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_embeds_unix_timestamp_ms():
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    after = time.time_ns() // 1_000_000
+    
+    assert before <= value.int >> 80 <= after
+
+
+def test_uuid7_sorts_by_creation_time():
+    first = uuid7()
+    time.sleep(0.002)
+    second = uuid7()
+    
+    assert first < second
+
+
+def test_uuid7_is_unique():
+    assert len({uuid7() for _ in range(1000)}) == 1000
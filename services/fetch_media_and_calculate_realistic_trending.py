@@ -273,7 +273,11 @@ class RealisticTrendingCalculator:
 
 async def main():
     calculator = RealisticTrendingCalculator()
-    await calculator.process_all_characters()
+    try:
+        await calculator.process_all_characters()
+    finally:
+        # Sessione HTTP AniList condivisa: va chiusa prima che asyncio.run chiuda il loop
+        await MediaFetcher.aclose()
 
 
 if __name__ == "__main__":
@@ -156,7 +156,12 @@ async def main():
     logger.info("🚀 Avvio test fetching serie trending...")
     
     # Test fetching
-    media_data = await test_trending_media()
+    try:
+        media_data = await test_trending_media()
+    finally:
+        # Sessione HTTP AniList condivisa: va chiusa prima che asyncio.run chiuda il loop
+        from src.fetchers.anilist_fetcher import AniListFetcher
+        await AniListFetcher.aclose()
     
     # Salva nel database
     await save_trending_data_to_db(media_data)
@@ -115,7 +115,11 @@ class GenderUpdater:
 async def main():
     """Funzione main"""
     updater = GenderUpdater()
-    await updater.process_all_characters()
+    try:
+        await updater.process_all_characters()
+    finally:
+        # Sessione HTTP AniList condivisa: va chiusa prima che asyncio.run chiuda il loop
+        await CharacterFetcher.aclose()
 
 
 if __name__ == "__main__":